@@ -0,0 +1,85 @@
+# Standard imports
+from collections.abc import Mapping
+from concurrent.futures import Future
+from threading import Lock
+
+class AttributeGraph(Mapping):
+    """Class that represents basin data where each attribute is only created
+    when it is first accessed.
+
+    Behaves as a read-only dictionary of attribute objects. Each builder is
+    called with the graph itself so it declares its dependencies by accessing
+    other attributes, which creates them on demand as well.
+
+    Attributes may be created by several threads at once. The first thread
+    to access an attribute creates it and other threads wait for the result,
+    so a builder only ever waits on an attribute that is being created.
+
+    Attributes
+    ----------
+        builders: dictionary
+            functions that create an attribute organized by attribute name
+        futures: dictionary
+            Future of each attribute being created organized by attribute name
+        lock: Lock
+            lock that guards values and futures
+        values: dictionary
+            attributes created so far organized by attribute name
+    """
+
+    def __init__(self, values, builders):
+        self.values = dict(values)
+        self.builders = builders
+        self.futures = {}
+        self.lock = Lock()
+
+    def __getitem__(self, name):
+        with self.lock:
+            if name in self.values:
+                return self.values[name]
+            future = self.futures.get(name)
+            owner = future is None
+            if owner:
+                future = self.futures[name] = Future()
+
+        # Wait for another thread or create attribute in this thread
+        if not owner:
+            return future.result()
+        try:
+            value = self.builders[name](self)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        with self.lock:
+            self.values[name] = value
+        future.set_result(value)
+        return value
+
+    def __contains__(self, name):
+        return name in self.values or name in self.builders
+
+    def __iter__(self):
+        return iter(list(self.values) + [name for name in self.builders if name not in self.values])
+
+    def __len__(self):
+        return len(set(self.values) | set(self.builders))
+
+    def evaluate(self, names, executor = None):
+        """Create the attributes in names and their dependencies now.
+
+        With an executor, attributes are created concurrently and started in
+        the order of builders so the builders listed first (e.g. input file
+        readers) are not queued behind builders that depend on them.
+        """
+
+        names = list(dict.fromkeys(names))
+        if executor is None:
+            for name in names:
+                self[name]
+            return
+
+        order = list(self.builders)
+        names = sorted(names, key = lambda name: order.index(name) if name in order else -1)
+        futures = [executor.submit(self.__getitem__, name) for name in names]
+        for future in futures:
+            future.result()
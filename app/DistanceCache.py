@@ -0,0 +1,107 @@
+# Standard imports
+import os
+from pathlib import Path
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.attributes.Utilities import hash_file, write_atomic
+
+class DistanceCache:
+    """Class that represents an on-disk cache of node distances.
+
+    Each basin has at most one cache file named after the basin number and a
+    hash of its topology file contents. A cache file stores the distance of
+    every node from its reach's start node in topology file order.
+
+    Attributes
+    ----------
+        cache_dir: Path
+            Path to directory that stores cache files
+        max_bytes: integer
+            Maximum total size of the cache files in bytes
+        max_files: integer
+            Maximum number of cache files
+    """
+
+    HASH_LENGTH = 16
+
+    def __init__(self, cache_dir, max_bytes, max_files):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self.cache_dir.mkdir(parents = True, exist_ok = True)
+
+    def get_path(self, basin_num, topology_file):
+        """Returns the cache file Path for the basin's current topology file."""
+
+        topo_hash = hash_file(topology_file)[:self.HASH_LENGTH]
+        return self.cache_dir / f"{basin_num}_{topo_hash}.npy"
+
+    def load(self, cache_file, num_nodes):
+        """Returns cached distances or None if the cache file is missing or invalid.
+
+        Stale cache files for the same basin (other topology hashes) are removed.
+        """
+
+        self._remove_stale(cache_file)
+        try:
+            distances = np.load(cache_file)
+        except (OSError, ValueError):
+            return None
+        if distances.shape != (num_nodes,):
+            return None
+
+        # Mark the file as recently used for eviction unless another rank
+        # has already evicted it
+        try:
+            os.utime(cache_file)
+        except FileNotFoundError:
+            pass
+        return distances
+
+    def save(self, cache_file, distances):
+        """Writes distances to cache_file and evicts files over the cache limits."""
+
+        write_atomic(cache_file, lambda file: np.save(file, np.asarray(distances, dtype = np.float64)))
+        self._evict(keep = cache_file)
+
+    def _remove_stale(self, cache_file):
+        """Remove cache files for the same basin that do not match cache_file."""
+
+        basin_num = cache_file.name.rsplit("_", 1)[0]
+        for entry in self.cache_dir.glob(f"{basin_num}_*.npy"):
+            if entry != cache_file and len(entry.stem) == len(cache_file.stem):
+                _unlink(entry)
+
+    def _evict(self, keep):
+        """Remove least recently used cache files until under the size limits."""
+
+        entries = []
+        for entry in self.cache_dir.glob("*.npy"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+        entries.sort()
+
+        total_bytes = sum(element[1] for element in entries)
+        total_files = len(entries)
+        for _, size, entry in entries:
+            if total_bytes <= self.max_bytes and total_files <= self.max_files:
+                break
+            if entry == keep:
+                continue
+            _unlink(entry)
+            total_bytes -= size
+            total_files -= 1
+
+def _unlink(path):
+    """Remove file at path ignoring files already removed by another rank."""
+
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
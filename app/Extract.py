@@ -1,9 +1,21 @@
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from queue import Queue
+from threading import Thread
+from time import time
+
 # Local imports
+from app.data.config import extract_config
+from app.AttributeGraph import AttributeGraph
 from app.Input import Input
-from app.Output import Output
+from app.InputCache import InputCache
+from app.Metrics import BasinMetrics, get_file_bytes
+from app.Output import get_products, Output, PRODUCTS
+from app.SlopePool import get_cores_per_rank, get_pool_size, SlopePool
+from app.attributes.Basin import Basin
 from app.attributes.Discharge import Discharge
 from app.attributes.Dxarea import Dxarea
-from app.attributes.Slope import Slope
+from app.attributes.Slope import set_kernel_threads, Slope
 from app.attributes.Topology import Topology
 from app.attributes.Width import Width
 from app.attributes.Wse import Wse
@@ -14,18 +26,56 @@ class Extract:
 
     Attributes
     ----------
+        basin_times: dictionary
+            seconds taken to process each basin organized by basin number
         input_dir_list: list
             list of Path objects to directories that contain basin files
+        load_pool: ThreadPoolExecutor
+            threads that read input files and create basin attributes 
+            concurrently or None when they are created one after another
         logger: Logger
             Logger object to log messages to a file
+        manifest: Manifest
+            record of completed basins used to skip them or None
+        metrics: Metrics
+            record of the stage metrics of every basin or None
         output_directory: Path
             Path to directory that will contain output files
+        output_layout: string
+            layout that basin output is written with or None to use the 
+            output_layout config
+        parallel_output: ParallelOutput
+            shared output files that basins are written to or None when each
+            basin is written to its own files
+        ranks_per_node: integer
+            number of MPI ranks that share the cores of this node
+        slope_pool: SlopePool
+            worker processes reused to calculate slope for every basin or None
+            when slope is calculated in this process
+        write_error: Exception
+            exception raised by the writer thread or None
+        write_queue: Queue
+            bounded queue of basin output waiting for the writer thread or None
+            when output is written by the calling thread
+        writer: Thread
+            background thread that writes basin output or None
     """
 
     def __init__(self, input_dir_list, output_directory, logger):
         self.input_dir_list = input_dir_list
         self.output_directory = output_directory
         self.logger = logger
+        self.basin_times = {}
+        self.load_pool = None
+        self.manifest = None
+        self.metrics = None
+        self.output_layout = None
+        self.parallel_output = None
+        self.ranks_per_node = 1
+        self.slope_pool = None
+        self.write_error = None
+        self.write_queue = None
+        self.writer = None
 
     def extract_data(self):
         """Extracts data from input and outputs two NetCDF files per river reach.
@@ -35,48 +85,244 @@ class Extract:
         data.
         """
 
-        for entry in self.input_dir_list:
+        self.start_workers()
+        try:
+            for entry in self.input_dir_list:
+                self.extract_basin(entry)
+        finally:
+            self.stop_workers()
+
+    def extract_basin(self, entry):
+        """Extracts data for the basin directory entry and outputs its NetCDF files.
+        
+        When the writer thread is running, output is handed off to it and this
+        method returns as soon as there is space in the write queue.
+        """
+
+        start = time()
+        self.logger.info(f"Processing basin: {entry.name}")
+        basin_metrics = BasinMetrics(entry.name)
 
-                self.logger.info(f"Processing basin: {entry.name}")
+        # Obtain input files
+        with basin_metrics.measure("input"):
+            input = Input(entry)
 
-                # Obtain input files
-                input = Input(entry)
+        # Skip complete basins and limit output to missing or truncated files
+        inputs, keys = None, None
+        if self.manifest is not None:
+            with basin_metrics.measure("manifest"):
+                inputs = self.manifest.hash_inputs(input)
+                redo_files = self.manifest.get_redo_files(entry.name, inputs)
+            if redo_files == []:
+                self.logger.info(f"Skipping complete basin: {entry.name}")
+                self.manifest.record(entry.name, inputs, [])
+                basin_metrics.skipped = True
+                self._complete_basin(basin_metrics, time() - start)
+                return
+            if redo_files is not None:
+                keys = set(name.rsplit("_", 1)[0] for name in redo_files)
 
-                # Retrieve data from UK files
-                data_dict = _create_data_dict(input, entry.name)
+        # Retrieve data from UK files
+        data_dict = _create_data_dict(input, entry.name, self.slope_pool, basin_metrics)
+        swot_products, sos_products = get_products()
+        data_dict.evaluate((PRODUCTS[name][0] for name in swot_products + sos_products), 
+            self.load_pool)
 
-                # Write output
-                output = Output(data_dict, self.output_directory, self.logger)
-                output.write_output()
-    
-def _create_data_dict(input, basin_num):
-    """Create a dictionary of node and reach level data from input files."""
+        # Write output
+        if self.parallel_output is not None:
+            with basin_metrics.measure("write"):
+                self.parallel_output.write_basin(data_dict)
+            self._complete_basin(basin_metrics, time() - start)
+            return
+        output = Output(data_dict, self.output_directory, self.logger, self.output_layout)
+        if self.write_queue is None:
+            self._write_basin(entry.name, output, keys, inputs, basin_metrics)
+            self._complete_basin(basin_metrics, time() - start)
+        else:
+            self._check_writer()
+            self.write_queue.put((entry.name, output, keys, inputs, basin_metrics, time() - start))
 
-    # Topology
-    topology = Topology(input.topology_file)
-    topo_df = list(topology.topo_data.groupby("reachid"))
-    topo_dict = { basin_num + '_' + element[0] : element[1] for element in topo_df }
+    def _write_basin(self, basin_num, output, keys, inputs, basin_metrics):
+        """Write basin output for reaches in keys (all reaches when None) and 
+        record the basin in the manifest."""
 
-    # Discharge reach and node data (Qhat and Qsd)
-    discharge = Discharge(input.discharge_file, topology, input.basin_num, input.invalid_nodes)
+        with basin_metrics.measure("write") as metrics:
+            output_files = output.write_output(keys)
+            metrics["bytes_written"] = get_file_bytes(output_files)
+        if self.manifest is not None:
+            self.manifest.record(basin_num, inputs, output_files)
 
-    # width reach and node data
-    width = Width(input.width_file, topology, input.basin_num, input.invalid_nodes)
+    def _complete_basin(self, basin_metrics, wall):
+        """Record the time taken by a processed basin and its metrics."""
 
-    # wse reach and node data
-    wse = Wse(input.wse_file, topology, input.basin_num, input.invalid_nodes)
+        if not basin_metrics.skipped:
+            self.basin_times[basin_metrics.basin_num] = wall
+        if self.metrics is not None:
+            self.metrics.record(basin_metrics, wall)
 
-    # slope2 reach and node data
-    slope = Slope(topology, wse.wse_node, input.basin_num, input.invalid_nodes)
+    def start_workers(self):
+        """Start the slope worker processes, loader threads and writer thread
+        that are reused for every basin.
+        
+        Worker processes are started first so they are forked before any 
+        thread is running.
+        """
+
+        self.start_slope_pool()
+        self.start_loader()
+        self.start_writer()
 
-    # d_x_area reach and node data
-    dxarea = Dxarea(width, wse, topology)
+    def stop_workers(self):
+        """Wait for queued output to be written and stop all workers."""
+
+        try:
+            self.stop_writer()
+        finally:
+            self.stop_loader()
+            self.stop_slope_pool()
+
+    def start_slope_pool(self):
+        """Start a pool of worker processes sized by the cores available to 
+        each of the ranks_per_node ranks; with one process per rank slope is
+        calculated in this process.
+        
+        Cores left over by the processes are used as slope kernel threads.
+        """
+
+        if self.slope_pool is not None: return
+        processes = get_pool_size(self.ranks_per_node)
+        threads = max(get_cores_per_rank(self.ranks_per_node) // processes, 1)
+        self.logger.info(f"Slope worker processes: {processes},    kernel threads: {threads}")
+        if processes <= 1:
+            set_kernel_threads(threads)
+        else:
+            self.slope_pool = SlopePool(processes, threads)
+
+    def stop_slope_pool(self):
+        """Stop the slope worker processes."""
+
+        if self.slope_pool is None: return
+        self.slope_pool.close()
+        self.slope_pool = None
+
+    def start_loader(self):
+        """Start a pool of load_threads threads in the config that read a 
+        basin's input files concurrently and create each attribute as soon as
+        the inputs it depends on are ready; 0 creates them one after another."""
+
+        threads = extract_config["load_threads"]
+        if threads <= 0 or self.load_pool is not None: return
+        self.load_pool = ThreadPoolExecutor(max_workers = threads, thread_name_prefix = "loader")
+
+    def stop_loader(self):
+        """Stop the pool of loader threads."""
+
+        if self.load_pool is None: return
+        self.load_pool.shutdown()
+        self.load_pool = None
+
+    def start_writer(self):
+        """Start a background thread that writes basin output while the next
+        basin is computed.
+        
+        The write queue holds at most write_queue_depth basins in the config so
+        memory stays bounded; a depth of 0 writes output in the calling thread.
+        Shared parallel output is always written by the calling thread.
+        """
 
-    return {
-        "topology" : topo_dict,
-        "discharge" : discharge,
-        "dxarea" : dxarea,
-        "slope" : slope,
-        "width" : width,
-        "wse" : wse
-    }
+        depth = extract_config["write_queue_depth"]
+        if depth <= 0 or self.writer is not None or self.parallel_output is not None: return
+        self.write_error = None
+        self.write_queue = Queue(maxsize = depth)
+        self.writer = Thread(target = self._write_basins, name = "writer", daemon = True)
+        self.writer.start()
+
+    def stop_writer(self):
+        """Wait for queued basin output to be written and stop the writer thread.
+        
+        Raises the first exception raised by the writer thread.
+        """
+
+        if self.writer is None: return
+        self.write_queue.put(None)
+        self.writer.join()
+        self.writer = None
+        self.write_queue = None
+        self._check_writer()
+
+    def _write_basins(self):
+        """Write basin output from the write queue until None is received.
+        
+        After an exception remaining output is discarded so the queue never
+        blocks the computing thread.
+        """
+
+        while True:
+            item = self.write_queue.get()
+            if item is None: break
+            if self.write_error is not None: continue
+            basin_num, output, keys, inputs, basin_metrics, compute_time = item
+            try:
+                start = time()
+                self._write_basin(basin_num, output, keys, inputs, basin_metrics)
+                self._complete_basin(basin_metrics, compute_time + time() - start)
+            except Exception as error:
+                self.logger.error(f"Could not write basin: {basin_num}")
+                self.write_error = error
+
+    def _check_writer(self):
+        """Raise the exception raised by the writer thread if there is one."""
+
+        if self.write_error is not None:
+            error, self.write_error = self.write_error, None
+            raise error
+    
+def _create_data_dict(input, basin_num, slope_pool = None, basin_metrics = None):
+    """Create a dictionary of node and reach level data from input files.
+    
+    Attributes are created when first accessed so only the input files and 
+    calculations needed by the selected output products are used. Slope is
+    calculated by slope_pool when it is not None. Each attribute is measured
+    as a stage of basin_metrics.
+    """
+
+    if basin_metrics is None:
+        basin_metrics = BasinMetrics(basin_num)
+
+    with basin_metrics.measure("topology", [input.topology_file]):
+        # Topology
+        topology = Topology(input.topology_file)
+        topo_df = list(topology.topo_data.groupby("reachid"))
+        topo_dict = { basin_num + '_' + element[0] : element[1] for element in topo_df }
+
+        # Nodes sorted by reach shared by node-level data
+        basin = Basin(topology, basin_num)
+    basin_metrics.nodes = int(basin.num_nodes)
+    basin_metrics.reaches = len(basin.keys)
+
+    # Parsed input data cached between runs
+    input_cache = None
+    if extract_config["input_cache_dir"]:
+        input_cache = InputCache(extract_config["input_cache_dir"], basin_num)
+
+    return AttributeGraph({ "topology" : topo_dict, "basin" : basin }, {
+        # Discharge reach and node data (Qhat and Qsd)
+        "discharge" : lambda data: basin_metrics.call("discharge", [input.discharge_file], 
+            Discharge, input.discharge_file, basin, input.invalid_nodes, input_cache),
+        
+        # width reach and node data
+        "width" : lambda data: basin_metrics.call("width", [input.width_file, input.width_file.with_suffix(".dbf")], 
+            Width, input.width_file, basin, input.invalid_nodes, input_cache),
+        
+        # wse reach and node data
+        "wse" : lambda data: basin_metrics.call("wse", [input.wse_file], 
+            Wse, input.wse_file, basin, input.invalid_nodes, input_cache),
+        
+        # slope2 reach and node data from wse
+        "slope" : lambda data: basin_metrics.call("slope", [], 
+            Slope, topology, data["wse"].wse_node, input.basin_num, input.invalid_nodes, slope_pool),
+        
+        # d_x_area reach and node data from width and wse
+        "dxarea" : lambda data: basin_metrics.call("dxarea", [], 
+            Dxarea, data["width"], data["wse"], topology)
+    })
@@ -0,0 +1,112 @@
+# Standard imports
+import json
+from pathlib import Path
+from threading import Lock
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.attributes.Utilities import hash_file, write_atomic
+
+class InputCache:
+    """Class that represents an on-disk cache of parsed input data for a basin.
+
+    Each entry is a set of .npy files parsed from one or more source input
+    files. A metadata file records the size, modification time and hash of
+    each source file; an entry is reused while its sources are unchanged and
+    is reloaded as copy-on-write memory maps so it is never parsed again.
+
+    Attributes
+    ----------
+        basin_dir: Path
+            Path to directory that stores the basin's cache files
+        lock: Lock
+            lock that guards metadata for entries read by concurrent threads
+        metadata: dictionary
+            sources and array names organized by entry name
+    """
+
+    METADATA_FILE = "metadata.json"
+
+    def __init__(self, cache_dir, basin_num):
+        self.basin_dir = Path(cache_dir) / basin_num
+        self.basin_dir.mkdir(parents = True, exist_ok = True)
+        self.lock = Lock()
+        try:
+            with open(self.basin_dir / self.METADATA_FILE) as json_file:
+                self.metadata = json.load(json_file)
+        except (OSError, ValueError):
+            self.metadata = {}
+
+    def read(self, name, sources, parse):
+        """Returns a dictionary of arrays for entry name.
+
+        Cached arrays are memory mapped when every source file is unchanged;
+        otherwise parse is called to create the arrays which are then cached.
+        """
+
+        arrays = self.load(name, sources)
+        if arrays is None:
+            arrays = parse()
+            self.save(name, sources, arrays)
+        return arrays
+
+    def load(self, name, sources):
+        """Returns a dictionary of copy-on-write memory-mapped arrays for entry
+        name or None if the entry is missing or a source file changed."""
+
+        entry = self.metadata.get(name)
+        if entry is None or sorted(entry["sources"]) != sorted(Path(source).name for source in sources):
+            return None
+
+        # Sources with a new modification time are compared by hash
+        touched = False
+        for source in sources:
+            recorded = entry["sources"][Path(source).name]
+            stat = Path(source).stat()
+            if stat.st_size != recorded["size"]:
+                return None
+            if stat.st_mtime_ns != recorded["mtime_ns"]:
+                if hash_file(source) != recorded["sha256"]:
+                    return None
+                recorded["mtime_ns"] = stat.st_mtime_ns
+                touched = True
+
+        try:
+            arrays = { array_name : np.load(self._get_path(name, array_name), mmap_mode = "c")
+                for array_name in entry["arrays"] }
+        except (OSError, ValueError):
+            return None
+        if touched:
+            with self.lock:
+                self._save_metadata()
+        return arrays
+
+    def save(self, name, sources, arrays):
+        """Write arrays of entry name and the state of its source files."""
+
+        for array_name, array in arrays.items():
+            if array is None: continue
+            write_atomic(self._get_path(name, array_name), lambda file: np.save(file, np.asarray(array)))
+
+        source_dict = {}
+        for source in sources:
+            stat = Path(source).stat()
+            source_dict[Path(source).name] = { "size" : stat.st_size, "mtime_ns" : stat.st_mtime_ns,
+                "sha256" : hash_file(source) }
+        with self.lock:
+            self.metadata[name] = { "sources" : source_dict,
+                "arrays" : [array_name for array_name, array in arrays.items() if array is not None] }
+            self._save_metadata()
+
+    def _get_path(self, name, array_name):
+        """Returns the Path of the .npy file of array_name in entry name."""
+
+        return self.basin_dir / f"{name}_{array_name}.npy"
+
+    def _save_metadata(self):
+        """Write the metadata file."""
+
+        write_atomic(self.basin_dir / self.METADATA_FILE,
+            lambda file: json.dump(self.metadata, file, indent = 1), mode = "w")
@@ -0,0 +1,136 @@
+# Standard imports
+import hashlib
+import json
+from pathlib import Path
+from threading import Lock
+from time import time
+
+# Local imports
+from app.attributes.Utilities import get_time_window, hash_file, write_atomic
+from app.data.config import extract_config
+
+class Manifest:
+    """Class that represents a record of completed basins used to resume runs.
+
+    Each rank writes its own manifest file after every completed basin. An
+    entry stores hashes of the basin's input files, invalid node list and
+    output encoding, the output layout, products and time window and the size
+    of every output file produced and when it was recorded. Entries from the
+    manifest files of all ranks of previous runs are used to decide which
+    basins and output files need to be written again, and are kept when a
+    rank saves its file so an interrupted run does not lose them; the most
+    recently recorded entry of a basin is used.
+
+    Attributes
+    ----------
+        entries: dictionary
+            entries of previous runs updated by basins completed or confirmed
+            in this run organized by basin number
+        layout: string
+            output layout the basins are written with
+        lock: Lock
+            lock that serializes entry updates from the writer thread
+        manifest_file: Path
+            Path to the manifest file of this rank
+        output_directory: Path
+            Path to directory that contains output files
+        previous: dictionary
+            entries of previous runs organized by basin number
+    """
+
+    INPUT_SUFFIXES = [".stage", ".discharge", "_T.csv", "_W.shp", "_W.shx", "_W.dbf"]
+
+    def __init__(self, manifest_dir, rank, output_directory, layout = None):
+        manifest_dir = Path(manifest_dir)
+        manifest_dir.mkdir(parents = True, exist_ok = True)
+        self.manifest_file = manifest_dir / f"manifest_{rank}.json"
+        self.output_directory = Path(output_directory)
+        self.previous = load_entries(manifest_dir)
+        self.entries = dict(self.previous)
+        self.layout = layout or extract_config["output_layout"]
+        self.lock = Lock()
+
+    def hash_inputs(self, input):
+        """Returns a dictionary that identifies the input and output settings
+        of the basin represented by the Input object."""
+
+        files = {}
+        for suffix in self.INPUT_SUFFIXES:
+            file = input.input_directory / (input.basin_num + suffix)
+            files[file.name] = hash_file(file) if file.exists() else None
+        invalid_nodes = json.dumps(input.invalid_nodes.get(input.basin_num), sort_keys = True)
+        encoding = json.dumps(extract_config["output_encoding"], sort_keys = True)
+        window = get_time_window()
+
+        return {
+            "files" : files,
+            "invalid_nodes" : hashlib.sha256(invalid_nodes.encode()).hexdigest(),
+            "output_encoding" : hashlib.sha256(encoding.encode()).hexdigest(),
+            "output_layout" : self.layout,
+            "products" : sorted(extract_config["products"]),
+            "time_window" : { "start" : window.start, "stop" : window.stop, "stride" : window.step }
+        }
+
+    def get_redo_files(self, basin_num, inputs):
+        """Returns a list of the names of recorded output files that are missing
+        or truncated or None if the basin has no entry with matching inputs."""
+
+        entry = self.previous.get(basin_num)
+        if entry is None or entry["inputs"] != inputs:
+            return None
+
+        redo_files = []
+        for name, size in entry["outputs"].items():
+            try:
+                if (self.output_directory / name).stat().st_size != size:
+                    redo_files.append(name)
+            except FileNotFoundError:
+                redo_files.append(name)
+        return redo_files
+
+    def record(self, basin_num, inputs, output_files):
+        """Record the basin as complete with the sizes of output_files and save
+        the manifest file.
+
+        Output files recorded by a previous entry with matching inputs are kept
+        so a basin that only rewrote some of its files stays complete.
+        """
+
+        names = set(file.name for file in output_files)
+        entry = self.previous.get(basin_num)
+        if entry is not None and entry["inputs"] == inputs:
+            names.update(entry["outputs"])
+        outputs = { name : (self.output_directory / name).stat().st_size for name in sorted(names) }
+
+        with self.lock:
+            self.entries[basin_num] = { "inputs" : inputs, "outputs" : outputs, "recorded" : time() }
+            self.save()
+
+    def save(self):
+        """Write entries to the manifest file, replacing it in one step so a
+        failed run never leaves a partial manifest."""
+
+        write_atomic(self.manifest_file, 
+            lambda file: json.dump(self.entries, file, indent = 1, sort_keys = True), mode = "w")
+
+def load_entries(manifest_dir):
+    """Returns entries from every manifest file in manifest_dir organized by
+    basin number.
+
+    Every rank keeps the entries of other ranks in its file, so the most
+    recently recorded entry of a basin takes precedence regardless of which
+    file was written last.
+    """
+
+    entries = {}
+    for manifest_file in manifest_dir.glob("manifest_*.json"):
+        try:
+            with open(manifest_file) as json_file:
+                file_entries = json.load(json_file)
+        except (OSError, ValueError):
+            continue
+        for basin_num, entry in file_entries.items():
+            current = entries.get(basin_num)
+            if current is None or entry.get("recorded", 0) > current.get("recorded", 0):
+                entries[basin_num] = entry
+    return entries
@@ -0,0 +1,186 @@
+# Standard imports
+from contextlib import contextmanager
+import json
+from pathlib import Path
+from threading import Lock
+from time import perf_counter, thread_time
+
+class Metrics:
+    """Class that represents the stage metrics of every basin processed by a
+    rank.
+
+    Each completed basin is appended to the rank's metrics file as one JSON
+    line so metrics of an interrupted run are kept up to its last basin.
+
+    Attributes
+    ----------
+        lock: Lock
+            lock that serializes records from the writer thread
+        metrics_file: Path
+            Path to the JSON lines file of this rank
+        rank: integer
+            MPI rank that processes the basins
+        records: list
+            dictionary of metrics of each basin recorded in this run
+    """
+
+    def __init__(self, metrics_dir, rank):
+        metrics_dir = Path(metrics_dir)
+        metrics_dir.mkdir(parents = True, exist_ok = True)
+        self.metrics_file = metrics_dir / f"metrics_{rank}.jsonl"
+        self.metrics_file.write_text("")
+        self.rank = rank
+        self.records = []
+        self.lock = Lock()
+
+    def record(self, basin_metrics, wall):
+        """Record basin_metrics of a basin that took wall seconds and append it
+        to the metrics file."""
+
+        record = { "rank" : self.rank, **basin_metrics.to_dict(), "wall" : wall }
+        with self.lock:
+            self.records.append(record)
+            with open(self.metrics_file, "a") as metrics_file:
+                metrics_file.write(json.dumps(record) + "\n")
+
+class BasinMetrics:
+    """Class that represents wall time, CPU time and bytes read and written by
+    each stage of one basin.
+
+    CPU time is measured for the thread that runs a stage, so it excludes
+    slope worker processes and kernel threads. Bytes read are the sizes of
+    the input files a stage parses and bytes written the sizes of the output
+    files written.
+
+    Attributes
+    ----------
+        basin_num: string
+            basin identifier
+        lock: Lock
+            lock that guards stages updated by loader threads
+        nodes: integer
+            number of nodes in the basin
+        reaches: integer
+            number of reaches in the basin
+        skipped: boolean
+            True when the basin was complete and not processed
+        stages: dictionary
+            wall, cpu, bytes_read and bytes_written of each stage organized by
+            stage name
+    """
+
+    def __init__(self, basin_num):
+        self.basin_num = basin_num
+        self.nodes = 0
+        self.reaches = 0
+        self.skipped = False
+        self.stages = {}
+        self.lock = Lock()
+
+    @contextmanager
+    def measure(self, stage, files = ()):
+        """Measure the enclosed block as stage, which reads files.
+
+        Yields the stage's dictionary so bytes_written can be set.
+        """
+
+        metrics = { "wall" : 0.0, "cpu" : 0.0, "bytes_read" : get_file_bytes(files), "bytes_written" : 0 }
+        wall, cpu = perf_counter(), thread_time()
+        try:
+            yield metrics
+        finally:
+            metrics["wall"] = perf_counter() - wall
+            metrics["cpu"] = thread_time() - cpu
+            with self.lock:
+                self.stages[stage] = metrics
+
+    def call(self, stage, files, function, *args):
+        """Returns function called with args measured as stage, which reads
+        files.
+
+        Arguments are evaluated before the call so attributes they access are
+        measured as their own stages.
+        """
+
+        with self.measure(stage, files):
+            return function(*args)
+
+    def to_dict(self):
+        """Returns a dictionary of the basin's metrics."""
+
+        with self.lock:
+            stages = dict(self.stages)
+        return { "basin" : self.basin_num, "skipped" : self.skipped, "nodes" : self.nodes,
+            "reaches" : self.reaches, "stages" : stages }
+
+def get_file_bytes(files):
+    """Returns the total size of the files that exist in files."""
+
+    total = 0
+    for file in files:
+        try:
+            total += Path(file).stat().st_size
+        except (OSError, TypeError):
+            continue
+    return total
+
+def summarize_metrics(rank_records, wall_times, first_worker = 0, slowest = 10):
+    """Returns a summary of the basin records gathered from every rank.
+
+    The summary holds the basins, busy time and stage times of each rank, the
+    load imbalance (max / mean busy time) of the ranks from first_worker on,
+    totals, share of busy time, throughput and imbalance of each stage and
+    the slowest basins.
+    """
+
+    ranks, stages = [], {}
+    for rank, (records, wall_time) in enumerate(zip(rank_records, wall_times)):
+        processed = [record for record in records if not record["skipped"]]
+        rank_stages = {}
+        for record in processed:
+            for name, metrics in record["stages"].items():
+                rank_stages[name] = rank_stages.get(name, 0.0) + metrics["wall"]
+                totals = stages.setdefault(name, { "wall" : 0.0, "cpu" : 0.0, "bytes_read" : 0, "bytes_written" : 0 })
+                for field in totals:
+                    totals[field] += metrics[field]
+        ranks.append({ "rank" : rank, "basins" : len(processed), "skipped" : len(records) - len(processed),
+            "nodes" : sum(record["nodes"] for record in processed),
+            "reaches" : sum(record["reaches"] for record in processed),
+            "busy" : sum(record["wall"] for record in processed), "wall" : wall_time, "stages" : rank_stages })
+
+    workers = ranks[first_worker:] or ranks
+    busy = sum(rank["busy"] for rank in ranks)
+    stage_busy = sum(totals["wall"] for totals in stages.values())
+    for name, totals in stages.items():
+        totals["share"] = totals["wall"] / stage_busy if stage_busy > 0 else 0.0
+        totals["read_mb_per_s"] = _rate(totals["bytes_read"] / 1e6, totals["wall"])
+        totals["write_mb_per_s"] = _rate(totals["bytes_written"] / 1e6, totals["wall"])
+        totals["imbalance"] = _imbalance([rank["stages"].get(name, 0.0) for rank in workers])
+
+    records = [record for records in rank_records for record in records if not record["skipped"]]
+    records.sort(key = lambda record: record["wall"], reverse = True)
+    nodes = sum(rank["nodes"] for rank in ranks)
+    return {
+        "ranks" : ranks,
+        "load_imbalance" : _imbalance([rank["busy"] for rank in workers]),
+        "basins" : len(records),
+        "busy" : busy,
+        "nodes_per_s" : _rate(nodes, busy),
+        "stages" : stages,
+        "slowest_basins" : [{ "rank" : record["rank"], "basin" : record["basin"], "wall" : record["wall"],
+            "nodes" : record["nodes"], "reaches" : record["reaches"],
+            "stages" : { name : metrics["wall"] for name, metrics in record["stages"].items() } }
+            for record in records[:slowest]]
+    }
+
+def _rate(amount, seconds):
+    """Returns amount per second or 0 when no time was taken."""
+
+    return amount / seconds if seconds > 0 else 0.0
+
+def _imbalance(values):
+    """Returns the ratio of the maximum to the mean of values or 1 when the
+    mean is 0."""
+
+    mean = sum(values) / len(values) if values else 0.0
+    return max(values) / mean if mean > 0 else 1.0
@@ -2,18 +2,35 @@
 from netCDF4 import Dataset
 import numpy as np
 
+# Local imports
+from app.attributes.Utilities import get_time_steps
+from app.data.config import extract_config
+
 class Output:
     """Class that represents output data to be written to NetCDF.
 
     Output consists of two NETCDFs per river reach; one for SWOT data and
-    one for SoS of Science data.
+    one for SoS of Science data. With the "basin" output_layout, output 
+    consists of two NETCDFs per basin that store all of the basin's reaches
+    along a reach dimension and all of its nodes as a contiguous ragged array
+    along the node dimension.
+
+    Only the variables listed by the products config are written and a file
+    without any selected variables is not written. The nt dimension holds 
+    the time steps of the time_window config.
 
     Attributes
     ----------
         data: dictionary
-            dictionary of UK data organized by reach as dataframe values
+            dictionary of UK data organized by reach
+        layout: string
+            "reach", "basin" or "parallel" output layout
         output_directory: Path
             Path to the directory where NetCDFs will be written
+        sos_products: list
+            names of SoS variables to write
+        swot_products: list
+            names of SWOT variables to write
         swot_dataset: Dataset
             netCDF4.Dataset object that represents SWOT NetCDF to be written
         swot_reach: Group
@@ -28,14 +45,14 @@ class Output:
             netCDF4.Group object for node level data
     """
 
-    #TIME_STEPS = 9862
-    TIME_STEPS = 9362
     FILL_VALUE = -9999
 
-    def __init__(self, data, output_directory, logger):
+    def __init__(self, data, output_directory, logger, layout = None):
         self.logger = logger
         self.data = data
+        self.layout = layout or extract_config["output_layout"]
         self.output_directory = output_directory
+        self.swot_products, self.sos_products = get_products()
         
         self.swot_dataset = None
         self.swot_reach = None
@@ -45,21 +62,45 @@ class Output:
         self.sos_reach = None
         self.sos_node = None
 
-    def write_output(self):
+    def write_output(self, keys = None):
         """Writes output to two NetCDF files for SWOT and SoS of Science data
-        on the reach and node level."""
+        on the reach and node level and returns a list of the files written.
+        
+        With the reach output_layout only reaches in the keys parameter are
+        written when it is given.
+        """
 
+        if self.layout == "basin":
+            return self._write_basin_output()
+
+        output_files = []
         for key, value in self.data["topology"].items():
+            if keys is not None and key not in keys: continue
             self.logger.info(f"WRITING REACH: {key}")
-            number_nodes = value.shape[0]
-            self._define_datasets(str(key))
-            self._create_dim_coords(number_nodes, len(str(key)))
-            self._create_groups()
-            self._create_swot_reach_vars(key)
-            self._create_swot_node_vars(key)
-            self._create_sos_reach_vars(key)
-            self.swot_dataset.close()
-            self.sos_dataset.close()
+            swot_file, sos_file = get_output_files(self.output_directory, key)
+
+            # SWOT
+            if self.swot_products:
+                self.swot_dataset = Dataset(swot_file, "w", format="NETCDF4")
+                self.swot_dataset.title = f"SWOT data for reach ID: {key}"
+                self._create_dim_coords(value.shape[0], len(str(key)))
+                self.swot_reach = self.swot_dataset.createGroup("reach")
+                self.swot_node = self.swot_dataset.createGroup("node")
+                self._create_swot_reach_vars(key)
+                self._create_swot_node_vars(key)
+                self.swot_dataset.close()
+                output_files.append(swot_file)
+
+            # SoS
+            if self.sos_products:
+                self.sos_dataset = Dataset(sos_file, "w", format="NETCDF4")
+                self.sos_dataset.title = f"SoS of Science data for reach ID: {key}"
+                self.sos_dataset.reach_id = key
+                self.sos_reach = self.sos_dataset.createGroup("reach")
+                self.sos_node = self.sos_dataset.createGroup("node")
+                self._create_sos_reach_vars(key)
+                self.sos_dataset.close()
+                output_files.append(sos_file)
 
             # Clear dataset and groups
             self.swot_dataset = None
@@ -69,161 +110,319 @@ class Output:
             self.sos_reach = None
             self.sos_node = None
 
-    def _define_datasets(self, reach_id):
-        """Defines datasets for writing SWOT and SoS data."""
-
-        # SWOT
-        swot_file = self.output_directory / (reach_id + "_SWOT.nc")
-        self.swot_dataset = Dataset(swot_file, "w", format="NETCDF4")
-        self.swot_dataset.title = f"SWOT data for reach ID: {reach_id}"
-
-        # SoS
-        sos_file = self.output_directory / (reach_id + "_SOS.nc")
-        self.sos_dataset = Dataset(sos_file, "w", format="NETCDF4")
-        self.sos_dataset.title = f"SoS of Science data for reach ID: {reach_id}"
-        self.sos_dataset.reach_id = reach_id
+        return output_files
 
     def _create_dim_coords(self, number_nodes, key_length):
         """Create dimensions and coordinate variables for each dimension."""
 
         # SWOT
         self.swot_dataset.createDimension("nchar", key_length)
-        self.swot_dataset.createDimension("nt", self.TIME_STEPS)
+        self.swot_dataset.createDimension("nt", len(get_time_steps()))
         self.swot_dataset.createDimension("nx", number_nodes)
         create_coord_var(self.swot_dataset, number_nodes)
 
-    def _create_groups(self):
-        """Create SWOT reach and node groups and SoS reach and node groups."""
-
-        # SWOT
-        self.swot_reach = self.swot_dataset.createGroup("reach")
-        self.swot_node = self.swot_dataset.createGroup("node")
-
-        # SoS
-        self.sos_reach = self.sos_dataset.createGroup("reach")
-        self.sos_node = self.sos_dataset.createGroup("node")
-
     def _create_swot_reach_vars(self, key):
         """Create SWOT reach-level variables."""
 
         # reachid
-        rid_v = self.swot_reach.createVariable("reach_id", "S1", ("nchar"))
-        rid_v.long_name = "reach ID from Euro benchmark data"
-        rid_v.comment = "Unique reach identifier from the Euro benchmark data." \
-            + " The format of the identifier is BBB_RRRR, where B=basin, R=reach."
-        rid_v[:] = (np.array(list(key), dtype="S4"))
+        create_reach_id_var(self.swot_reach, ("nchar"), key)
 
-        # d_x_area
-        dxa_v = self.swot_reach.createVariable("d_x_area", "f8", ("nt"), fill_value = self.FILL_VALUE)
-        dxa_v.long_name = "change in cross-sectional area"
-        dxa_v.units = "m^2"
-        dxa_v.valid_min = -10000000
-        dxa_v.valid_max = 10000000
-        self.data["dxarea"].dxarea_reach[key].fillna(value = self.FILL_VALUE, inplace = True)
-        dxa_v[:] = self.data["dxarea"].dxarea_reach[key].to_numpy()
-        
-        # slope2
-        slope2_v = self.swot_reach.createVariable("slope2", "f8", ("nt"), fill_value = self.FILL_VALUE)
-        slope2_v.long_name = "enhanced water surface slope with respect to geoid"
-        slope2_v.units = "m/m"
-        slope2_v.valid_min = -0.001
-        slope2_v.valid_max = 0.1
-        self.data["slope"].slope_reach[key].fillna(value = self.FILL_VALUE, inplace = True)
-        slope2_v[:] = self.data["slope"].slope_reach[key].to_numpy()
-
-        # width
-        width_v = self.swot_reach.createVariable("width", "f8", ("nt"), fill_value = self.FILL_VALUE)
-        width_v.long_name = "reach width"
-        width_v.units = "m"
-        width_v.valid_min = 0.0
-        width_v.valid_max = 100000
-        self.data["width"].width_reach[key].fillna(value = self.FILL_VALUE, inplace = True)
-        width_v[:] = self.data["width"].width_reach[key].to_numpy()
-
-        # wse
-        wse_v = self.swot_reach.createVariable("wse", "f8", ("nt"), fill_value = self.FILL_VALUE)
-        wse_v.long_name = "water surface elevation with respect to the geoid"
-        wse_v.units = "m"
-        wse_v.valid_min = -1000
-        wse_v.valid_max = 100000
-        self.data["wse"].wse_reach[key].fillna(value = self.FILL_VALUE, inplace = True)
-        wse_v[:] = self.data["wse"].wse_reach[key].to_numpy()
+        # d_x_area, slope2, width and wse
+        for name in self.swot_products:
+            variable = create_var(self.swot_reach, name, ("nt"))
+            variable[:] = mask_nan(self.get_reach_data(name)[key])
 
     def _create_sos_reach_vars(self, key):
         """Create SoS reach-level variables."""
 
-        # Qhat
-        qhat_v = self.sos_reach.createVariable("Qhat", "f8", fill_value = self.FILL_VALUE)
-        qhat_v.long_name = "Mean_Q"
-        qhat_v.units = "m^3/s"
-        qhat = self.FILL_VALUE if np.isnan(self.data["discharge"].qhat_reach[key]) else self.data["discharge"].qhat_reach[key]
-        qhat_v.assignValue(qhat)
-
-        # Qsd
-        qsd_v = self.sos_reach.createVariable("Qsd", "f8", fill_value = self.FILL_VALUE)
-        qsd_v.long_name = "sd_Q"
-        qsd_v.units = "m^3/s"
-        qsd = self.FILL_VALUE if np.isnan(self.data["discharge"].qsd_reach[key]) else self.data["discharge"].qsd_reach[key]
-        qsd_v.assignValue(qsd)
+        # Qhat and Qsd
+        for name in self.sos_products:
+            variable = create_var(self.sos_reach, name, ())
+            value = self.get_reach_data(name)[key]
+            variable.assignValue(self.FILL_VALUE if np.isnan(value) else value)
 
     def _create_swot_node_vars(self, key):
         """Create SWOT node-level variables."""
 
         # reachid
-        rid_v = self.swot_node.createVariable("reach_id", "S1", ("nchar"))
-        rid_v.long_name = "reach ID from Euro benchmark data"
-        rid_v.comment = "Unique reach identifier from the Euro benchmark data." \
-            + " The format of the identifier is BBB_RRRR, where B=basin, R=reach."
-        rid_v[:] = rid_v[:] = (np.array(list(key), dtype="S4"))
-
-        # d_x_area
-        dxa_v = self.swot_node.createVariable("d_x_area", "f8", ("nx", "nt"), fill_value = self.FILL_VALUE)
-        dxa_v.long_name = "change in cross-sectional area"
-        dxa_v.units = "m^2"
-        dxa_v.valid_min = -10000000
-        dxa_v.valid_max = 10000000
-        self.data["dxarea"].dxarea_node[key].fillna(value = self.FILL_VALUE, inplace = True)
-        dxa_v[:] = self.data["dxarea"].dxarea_node[key].to_numpy()
+        create_reach_id_var(self.swot_node, ("nchar"), key)
+
+        # d_x_area, slope2, width and wse
+        for name in self.swot_products:
+            variable = create_var(self.swot_node, name, ("nx", "nt"))
+            variable[:] = mask_nan(self.get_node_data(name, key))
+
+    def get_reach_data(self, name):
+        """Returns the reach-level data of variable name organized by reach."""
+
+        attribute, reach_name, _ = PRODUCTS[name]
+        return getattr(self.data[attribute], reach_name)
+
+    def get_node_data(self, name, key = None):
+        """Returns the nx by nt node-level data of variable name for reach key
+        or for every node in the basin sorted by reach when key is None."""
+
+        attribute, _, node_name = PRODUCTS[name]
+        if name == "slope2":
+            slope = self.data[attribute]
+            return slope.get_basin_matrix() if key is None else slope.get_node_matrix(key)
+        node_array = getattr(self.data[attribute], node_name)
+        return node_array.data if key is None else node_array[key]
+
+    def _write_basin_output(self):
+        """Writes one SWOT and one SoS NetCDF file for all reaches in the basin
+        with a single write for each variable and returns the files written."""
+
+        basin = self.data["basin"]
+        self.logger.info(f"WRITING BASIN: {basin.basin_num}")
+        key_length = max([len(key) for key in basin.keys], default = 1)
+        swot_file, sos_file = get_output_files(self.output_directory, basin.basin_num)
+        output_files = []
+
+        # SWOT
+        if self.swot_products:
+            with Dataset(swot_file, "w", format="NETCDF4") as swot_dataset:
+                swot_dataset.title = f"SWOT data for basin: {basin.basin_num}"
+                define_basin_swot(swot_dataset, len(basin.keys), key_length, basin.num_nodes)
+                self.write_basin_swot(swot_dataset, 0, 0)
+            output_files.append(swot_file)
+
+        # SoS
+        if self.sos_products:
+            with Dataset(sos_file, "w", format="NETCDF4") as sos_dataset:
+                sos_dataset.title = f"SoS of Science data for basin: {basin.basin_num}"
+                define_basin_sos(sos_dataset, len(basin.keys), key_length)
+                self.write_basin_sos(sos_dataset, 0)
+            output_files.append(sos_file)
+
+        return output_files
+
+    def write_basin_swot(self, dataset, reach_start, node_start):
+        """Write SWOT reach and node-level data for every reach in the basin to
+        a dataset defined by define_basin_swot.
         
-        # slope2
-        slope2_v = self.swot_node.createVariable("slope2", "f8", 
-            ("nx", "nt"), fill_value = self.FILL_VALUE)
-        slope2_v.long_name = "enhanced water surface slope with respect to geoid"
-        slope2_v.units = "m/m"
-        slope2_v.valid_min = -0.001
-        slope2_v.valid_max = 0.1
-        self.data["slope"].slope_node[key].fillna(value = self.FILL_VALUE, inplace = True)
-        slope2_v[:] = self.data["slope"].slope_node[key].to_numpy()
-
-        # width
-        width_v = self.swot_node.createVariable("width", "f8", ("nx", "nt",), fill_value = self.FILL_VALUE)
-        width_v.long_name = "node width"
-        width_v.units = "m"
-        width_v.valid_min = 0.0
-        width_v.valid_max = 100000
-        self.data["width"].width_node[key].fillna(value = self.FILL_VALUE, inplace = True)
-        width_v[:] = self.data["width"].width_node[key].to_numpy()
-
-        # wse
-        wse_v = self.swot_node.createVariable("wse", "f8", ("nx", "nt",), fill_value = self.FILL_VALUE)
-        wse_v.long_name = "water surface elevation with respect to the geoid"
-        wse_v.units = "m"
-        wse_v.valid_min = -1000
-        wse_v.valid_max = 100000
-        self.data["wse"].wse_node[key].fillna(value = self.FILL_VALUE, inplace = True)
-        wse_v[:] = self.data["wse"].wse_node[key].to_numpy()
+        The basin's reaches start at reach_start along nreach and its nodes
+        start at node_start along nx.
+        """
+
+        basin = self.data["basin"]
+        reaches = slice(reach_start, reach_start + len(basin.keys))
+        nodes = slice(node_start, node_start + basin.num_nodes)
+
+        # Reach-level data as reach by time step matrices
+        reach = dataset["reach"]
+        reach["reach_id"][reaches] = encode_reach_ids(basin.keys, reach["reach_id"].shape[-1])
+        reach["node_count"][reaches] = np.diff(basin.offsets)
+        for name in self.swot_products:
+            reach[name][reaches] = stack_reach_series(self.get_reach_data(name), basin.keys)
+
+        # Node-level data as node by time step matrices sorted by reach
+        node = dataset["node"]
+        node["reach_index"][nodes] = np.repeat(np.arange(reaches.start, reaches.stop), 
+            np.diff(basin.offsets))
+        for name in self.swot_products:
+            node[name][nodes] = mask_nan(self.get_node_data(name))
+
+    def write_basin_sos(self, dataset, reach_start):
+        """Write SoS reach-level data for every reach in the basin to a dataset 
+        defined by define_basin_sos with the basin's reaches starting at 
+        reach_start along nreach."""
+
+        basin = self.data["basin"]
+        reaches = slice(reach_start, reach_start + len(basin.keys))
+
+        reach = dataset["reach"]
+        reach["reach_id"][reaches] = encode_reach_ids(basin.keys, reach["reach_id"].shape[-1])
+        for name in self.sos_products:
+            reach_data = self.get_reach_data(name)
+            reach[name][reaches] = mask_nan([reach_data[key] for key in basin.keys])
+
+def get_products():
+    """Returns lists of the SWOT and the SoS variables selected by the products
+    config in output order."""
+
+    products = extract_config["products"]
+    unknown = set(products) - set(PRODUCTS)
+    if unknown:
+        raise ValueError(f"Unknown output products: {', '.join(sorted(unknown))}")
+    swot_products = [name for name in SWOT_PRODUCTS if name in products]
+    sos_products = [name for name in SOS_PRODUCTS if name in products]
+    return swot_products, sos_products
+
+def get_output_files(output_directory, identifier):
+    """Returns the SWOT and SoS file Paths for a reach key or a basin number."""
+
+    return [output_directory / (identifier + "_SWOT.nc"), output_directory / (identifier + "_SOS.nc")]
+
+def define_basin_swot(dataset, number_reaches, key_length, number_nodes, filters = True):
+    """Define dimensions, groups and variables of a SWOT dataset that stores 
+    reaches along nreach and nodes sorted by reach along nx.
+    
+    Compression settings are left out when filters is False.
+    """
+
+    swot_products, _ = get_products()
+    dataset.createDimension("nreach", number_reaches)
+    dataset.createDimension("nchar", key_length)
+    dataset.createDimension("nt", len(get_time_steps()))
+    dataset.createDimension("nx", number_nodes)
+    create_coord_var(dataset, number_nodes)
+
+    # Reach group
+    reach = dataset.createGroup("reach")
+    create_reach_id_var(reach, ("nreach", "nchar"))
+    
+    # Number of nodes of each reach in the node group (contiguous ragged array)
+    count_v = reach.createVariable("node_count", "i4", ("nreach",))
+    count_v.long_name = "number of nodes in each reach"
+    count_v.sample_dimension = "nx"
+
+    for name in swot_products:
+        create_var(reach, name, ("nreach", "nt"), filters = filters)
+
+    # Node group
+    node = dataset.createGroup("node")
+    index_v = node.createVariable("reach_index", "i4", ("nx",))
+    index_v.long_name = "index of the reach of each node along the nreach dimension"
+    
+    for name in swot_products:
+        create_var(node, name, ("nx", "nt"), filters = filters)
+
+def define_basin_sos(dataset, number_reaches, key_length, filters = True):
+    """Define dimensions, groups and variables of a SoS dataset that stores
+    reaches along nreach.
+    
+    Compression settings are left out when filters is False.
+    """
+
+    _, sos_products = get_products()
+    dataset.createDimension("nreach", number_reaches)
+    dataset.createDimension("nchar", key_length)
+
+    reach = dataset.createGroup("reach")
+    create_reach_id_var(reach, ("nreach", "nchar"))
+    for name in sos_products:
+        create_var(reach, name, ("nreach",), filters = filters)
+    dataset.createGroup("node")
+
+# Attribute, reach-level data and node-level data attribute names of each product
+PRODUCTS = {
+    "d_x_area" : ("dxarea", "dxarea_reach", "dxarea_node"),
+    "slope2" : ("slope", "slope_reach", "slope_node"),
+    "width" : ("width", "width_reach", "width_node"),
+    "wse" : ("wse", "wse_reach", "wse_node"),
+    "Qhat" : ("discharge", "qhat_reach", None),
+    "Qsd" : ("discharge", "qsd_reach", None)
+}
+SWOT_PRODUCTS = ["d_x_area", "slope2", "width", "wse"]
+SOS_PRODUCTS = ["Qhat", "Qsd"]
+
+FILTER_SETTINGS = ("zlib", "complevel", "shuffle", "compression", "fletcher32", "szip_coding",
+    "szip_pixels_per_block", "blosc_shuffle")
+
+VARIABLE_ATTRIBUTES = {
+    "d_x_area" : { "long_name" : "change in cross-sectional area", "units" : "m^2", 
+        "valid_min" : -10000000, "valid_max" : 10000000 },
+    "slope2" : { "long_name" : "enhanced water surface slope with respect to geoid", 
+        "units" : "m/m", "valid_min" : -0.001, "valid_max" : 0.1 },
+    "width" : { "long_name" : "{group} width", "units" : "m", "valid_min" : 0.0, 
+        "valid_max" : 100000 },
+    "wse" : { "long_name" : "water surface elevation with respect to the geoid", 
+        "units" : "m", "valid_min" : -1000, "valid_max" : 100000 },
+    "Qhat" : { "long_name" : "Mean_Q", "units" : "m^3/s" },
+    "Qsd" : { "long_name" : "sd_Q", "units" : "m^3/s" }
+}
+
+def create_var(group, name, dimensions, filters = True):
+    """Create a float variable in group with the attributes of the variable name."""
+
+    datatype, encoding = get_encoding(group, name, dimensions, filters)
+    variable = group.createVariable(name, datatype, dimensions, 
+        fill_value = Output.FILL_VALUE, **encoding)
+    attributes = dict(VARIABLE_ATTRIBUTES[name])
+    variable.long_name = attributes.pop("long_name").format(group = group.name)
+    variable.setncatts(attributes)
+    return variable
+
+def get_encoding(group, name, dimensions, filters = True):
+    """Returns the storage data type and createVariable keyword arguments for 
+    variable name in group.
+
+    Settings come from the output_encoding config which is keyed by variable
+    name or by group and variable name (e.g. "node/width"); group settings take
+    precedence. Chunk sizes are given per dimension name and are limited to the
+    size of the dimension. Scalar variables are always stored as is and 
+    compression settings are removed when filters is False.
+    """
+
+    encoding = dict(extract_config["output_encoding"].get(name, {}))
+    encoding.update(extract_config["output_encoding"].get(f"{group.name}/{name}", {}))
+    datatype = encoding.pop("dtype", "f8")
+    if not filters:
+        for setting in FILTER_SETTINGS: encoding.pop(setting, None)
+
+    if isinstance(dimensions, str): dimensions = (dimensions,)
+    if not dimensions: return datatype, {}
+
+    if "chunksizes" in encoding:
+        sizes = [get_dimension_size(group, dimension) for dimension in dimensions]
+        encoding["chunksizes"] = [max(min(encoding["chunksizes"].get(dimension, size), size), 1) 
+            for dimension, size in zip(dimensions, sizes)]
+    return datatype, encoding
+
+def get_dimension_size(group, dimension):
+    """Returns the size of dimension defined in group or one of its parents."""
+
+    while dimension not in group.dimensions:
+        group = group.parent
+    return len(group.dimensions[dimension])
+
+def create_reach_id_var(group, dimensions, key = None):
+    """Create a reach identifier character variable in group and write the 
+    reach key or list of reach keys when given."""
+
+    rid_v = group.createVariable("reach_id", "S1", dimensions)
+    rid_v.long_name = "reach ID from Euro benchmark data"
+    rid_v.comment = "Unique reach identifier from the Euro benchmark data." \
+        + " The format of the identifier is BBB_RRRR, where B=basin, R=reach."
+    if isinstance(key, str):
+        rid_v[:] = (np.array(list(key), dtype="S4"))
+    elif key is not None:
+        rid_v[:] = encode_reach_ids(key, rid_v.shape[-1])
+    return rid_v
+
+def encode_reach_ids(keys, key_length):
+    """Returns a reach by key_length character array of the list of reach keys."""
+
+    return np.array(keys, dtype=f"S{key_length}").view("S1").reshape(-1, key_length)
+
+def stack_reach_series(reach_dict, keys):
+    """Returns a reach by time step matrix of the series in reach_dict ordered by
+    keys with NaN values masked."""
+
+    return mask_nan(np.vstack([reach_dict[key] for key in keys]))
 
 def create_coord_var(dataset, number_nodes):
     """Create coordinate variables for each dimension in the parameter dataset."""
 
-    # time step coordinate variable
+    # time step coordinate variable counted from the start of the time window
     nt = dataset.createVariable("nt", "i4", ("nt",))
     nt.units = "day"
     nt.long_name = "nt"
-    nt[:] = range(0, Output.TIME_STEPS)
+    nt[:] = get_time_steps()
 
     # node coordinate variable
     nx = dataset.createVariable("nx", "i4", ("nx",))
     nx.units = "node"
     nx.long_name = "nx"
-    nx[:] = range(1, number_nodes + 1)
\ No newline at end of file
+    nx[:] = range(1, number_nodes + 1)
+
+def mask_nan(data):
+    """Returns a masked array of the data parameter with NaN values masked.
+
+    The data is not copied or changed; netCDF4 writes masked values as the
+    variable's fill value.
+    """
+
+    data = np.asarray(data, dtype = np.float64)
+    return np.ma.masked_where(np.isnan(data), data, copy = False)
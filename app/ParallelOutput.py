@@ -0,0 +1,125 @@
+# Standard imports
+from os import scandir
+from pathlib import Path
+
+# Third party imports
+import netCDF4
+from netCDF4 import Dataset
+
+# Local imports
+from app.Output import Output, define_basin_sos, define_basin_swot, get_products
+from app.attributes.Basin import Basin
+from app.attributes.Topology import Topology
+
+class ParallelOutput:
+    """Class that represents one SWOT and one SoS NetCDF file shared by all
+    ranks of a run.
+
+    Files are opened collectively with parallel HDF5 (MPI-IO) and every basin
+    of the input directory has a fixed range of reaches along nreach and of
+    nodes along nx so each rank writes the basins it processes independently.
+    Reaches and nodes are ordered by basin number. A file is not created when
+    none of its variables are selected by the products config.
+
+    Attributes
+    ----------
+        comm: Comm
+            MPI communicator of the ranks that share the files
+        logger: Logger
+            Logger object to log messages to a file
+        offsets: dictionary
+            reach and node start of each basin organized by basin number
+        sos_dataset: Dataset
+            netCDF4.Dataset object that represents shared SoS NetCDF or None
+        swot_dataset: Dataset
+            netCDF4.Dataset object that represents shared SWOT NetCDF or None
+    """
+
+    SOS_FILE = "run_SOS.nc"
+    SWOT_FILE = "run_SWOT.nc"
+
+    def __init__(self, comm, input_dir, output_directory, logger):
+        """Define shared files for every basin in input_dir.
+
+        Must be called by every rank of comm.
+        """
+
+        self.comm = comm
+        self.logger = logger
+
+        # Determine the reaches and nodes of each basin on one rank
+        layout = create_layout(input_dir) if comm.Get_rank() == 0 else None
+        layout = comm.bcast(layout, root = 0)
+        self.offsets = layout["offsets"]
+
+        # Compression filters require collective writes so they are left out
+        swot_products, sos_products = get_products()
+        self.swot_dataset = None
+        if swot_products:
+            self.swot_dataset = open_dataset(Path(output_directory) / self.SWOT_FILE, comm)
+            self.swot_dataset.title = "SWOT data for all basins"
+            define_basin_swot(self.swot_dataset, layout["number_reaches"], layout["key_length"],
+                layout["number_nodes"], filters = False)
+
+        self.sos_dataset = None
+        if sos_products:
+            self.sos_dataset = open_dataset(Path(output_directory) / self.SOS_FILE, comm)
+            self.sos_dataset.title = "SoS of Science data for all basins"
+            define_basin_sos(self.sos_dataset, layout["number_reaches"], layout["key_length"],
+                filters = False)
+
+    def write_basin(self, data):
+        """Write the basin data dictionary to its range of the shared files."""
+
+        basin_num = data["basin"].basin_num
+        self.logger.info(f"WRITING BASIN: {basin_num}")
+        reach_start, node_start = self.offsets[basin_num]
+        output = Output(data, None, self.logger, "parallel")
+        if self.swot_dataset is not None:
+            output.write_basin_swot(self.swot_dataset, reach_start, node_start)
+        if self.sos_dataset is not None:
+            output.write_basin_sos(self.sos_dataset, reach_start)
+
+    def close(self):
+        """Close shared files; must be called by every rank of comm."""
+
+        if self.swot_dataset is not None:
+            self.swot_dataset.close()
+        if self.sos_dataset is not None:
+            self.sos_dataset.close()
+
+def create_layout(input_dir):
+    """Returns a dictionary of the reach and node start of each basin directory
+    in input_dir, the total number of reaches and nodes and the maximum reach
+    identifier length."""
+
+    with scandir(input_dir) as entries:
+        basin_list = sorted(entry.name for entry in entries if entry.is_dir())
+
+    offsets = {}
+    number_reaches, number_nodes, key_length = 0, 0, 1
+    for basin_num in basin_list:
+        topology = Topology(Path(input_dir) / basin_num / (basin_num + "_T.csv"))
+        basin = Basin(topology, basin_num)
+        offsets[basin_num] = (number_reaches, number_nodes)
+        number_reaches += len(basin.keys)
+        number_nodes += basin.num_nodes
+        key_length = max([key_length] + [len(key) for key in basin.keys])
+
+    return { "offsets" : offsets, "number_reaches" : number_reaches,
+        "number_nodes" : number_nodes, "key_length" : key_length }
+
+def is_parallel_available(comm):
+    """Returns True if shared files can be written by the ranks of comm.
+
+    A single rank writes shared files without parallel HDF5.
+    """
+
+    return comm.Get_size() == 1 or bool(netCDF4.__has_parallel4_support__)
+
+def open_dataset(file, comm):
+    """Returns a NETCDF4 Dataset opened for writing by every rank of comm."""
+
+    if netCDF4.__has_parallel4_support__:
+        return Dataset(file, "w", format = "NETCDF4", parallel = True, comm = comm)
+    return Dataset(file, "w", format = "NETCDF4")
@@ -0,0 +1,69 @@
+# Standard imports
+import heapq
+
+# Third party imports
+import pandas as pd
+
+"""Functions that divide basin directories between ranks using an estimate of
+the cost to process each basin."""
+
+def estimate_costs(dir_list, weights):
+    """Returns a dictionary of basin directory keys with an estimated cost value.
+
+    The cost is a weighted sum of basin metrics: "nodes" (topology node count),
+    "reaches" (topology reach count), "stage_bytes" (.stage file size) and
+    "discharge_bytes" (.discharge file size). Each metric is divided by its
+    mean over all basins so weights are comparable.
+    """
+
+    metric_dict = { name : [get_basin_metric(entry, name) for entry in dir_list]
+        for name, weight in weights.items() if weight != 0 }
+
+    cost_dict = { entry : 0.0 for entry in dir_list }
+    for name, values in metric_dict.items():
+        mean = sum(values) / len(values) if values else 0
+        if mean == 0: continue
+        for entry, value in zip(dir_list, values):
+            cost_dict[entry] += weights[name] * value / mean
+
+    return cost_dict
+
+def get_basin_metric(basin_dir, name):
+    """Returns the value of the metric name for the basin directory."""
+
+    basin_num = basin_dir.name
+    try:
+        if name == "nodes":
+            with open(basin_dir / (basin_num + "_T.csv")) as topology_file:
+                return max(sum(1 for line in topology_file) - 1, 0)
+        elif name == "reaches":
+            topo_df = pd.read_csv(basin_dir / (basin_num + "_T.csv"), usecols = ["link"])
+            return topo_df["link"].nunique()
+        elif name == "stage_bytes":
+            return (basin_dir / (basin_num + ".stage")).stat().st_size
+        elif name == "discharge_bytes":
+            return (basin_dir / (basin_num + ".discharge")).stat().st_size
+    except (FileNotFoundError, NotADirectoryError, ValueError):
+        return 0
+    raise ValueError(f"Unknown basin cost metric: {name}")
+
+def partition_basins(cost_dict, size):
+    """Assign basins to size ranks with a longest-processing-time-first greedy
+    scheme.
+
+    Returns a dictionary of rank keys with a directory list value and a
+    dictionary of rank keys with a predicted load value.
+    """
+
+    dir_dict = { rank : [] for rank in range(size) }
+    load_dict = { rank : 0.0 for rank in range(size) }
+
+    # Assign the most costly remaining basin to the least loaded rank
+    heap = [(0.0, rank) for rank in range(size)]
+    for entry in sorted(cost_dict, key = lambda entry: (-cost_dict[entry], str(entry))):
+        load, rank = heapq.heappop(heap)
+        dir_dict[rank].append(entry)
+        load_dict[rank] = load + cost_dict[entry]
+        heapq.heappush(heap, (load_dict[rank], rank))
+
+    return dir_dict, load_dict
@@ -0,0 +1,117 @@
+# Standard imports
+from multiprocessing import Pool
+import os
+from pathlib import Path
+import shutil
+import tempfile
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.attributes.Slope import calculate_reach_slopes, set_kernel_threads
+from app.data.config import extract_config
+
+class SlopePool:
+    """Class that represents a pool of worker processes that is created once
+    per rank and reused to calculate the reach slopes of every basin.
+
+    Basin wse and node distances are handed to the workers as .npy files in a
+    memory-backed directory that every process memory maps, and the workers
+    write slopes to a shared .npy file, so only file paths and reach ranges
+    are sent to the workers.
+
+    Attributes
+    ----------
+        directory: Path
+            Path to temporary directory that stores shared arrays
+        pool: Pool
+            multiprocessing.Pool of worker processes
+        processes: integer
+            number of worker processes
+        threads: integer
+            number of threads used by the slope kernel in each worker process
+    """
+
+    SHARED_DIR = Path("/dev/shm")
+    TASKS_PER_PROCESS = 4
+
+    def __init__(self, processes, threads = 1):
+        self.processes = processes
+        self.threads = threads
+        self.pool = Pool(processes, initializer = set_kernel_threads, initargs = (threads,))
+        shared_dir = self.SHARED_DIR if self.SHARED_DIR.is_dir() else None
+        self.directory = Path(tempfile.mkdtemp(prefix = "slope_", dir = shared_dir))
+
+    def calculate(self, wse, distances, offsets):
+        """Returns a reach by time step matrix of slopes from node by time step
+        wse and node distances sorted by reach, where the nodes of reach i are
+        offsets[i] to offsets[i + 1]."""
+
+        offsets = np.asarray(offsets)
+        num_reaches = offsets.shape[0] - 1
+        basin_dir = Path(tempfile.mkdtemp(dir = self.directory))
+        try:
+            # Shared input and output arrays
+            paths = { name : basin_dir / f"{name}.npy" for name in ["wse", "distances", "slopes"] }
+            np.save(paths["wse"], np.asarray(wse, dtype = np.float64))
+            np.save(paths["distances"], np.asarray(distances, dtype = np.float64))
+            slopes = np.lib.format.open_memmap(paths["slopes"], mode = "w+", dtype = np.float64,
+                shape = (num_reaches, wse.shape[1]))
+            del slopes
+
+            # Ranges of reaches with a similar number of nodes for each task
+            tasks = _split_reaches(offsets, self.processes * self.TASKS_PER_PROCESS)
+            self.pool.starmap(_calculate_task, ((paths, offsets, reaches) for reaches in tasks))
+            return np.load(paths["slopes"])
+        finally:
+            shutil.rmtree(basin_dir, ignore_errors = True)
+
+    def close(self):
+        """Stop the worker processes and remove shared arrays."""
+
+        self.pool.close()
+        self.pool.join()
+        shutil.rmtree(self.directory, ignore_errors = True)
+
+def get_pool_size(ranks_per_node):
+    """Returns the number of slope worker processes for each rank.
+
+    The cores available to this process are divided between the ranks on the
+    node; no_cores in the config limits the result when greater than 0.
+    """
+
+    cores_per_rank = get_cores_per_rank(ranks_per_node)
+    if extract_config["no_cores"] > 0:
+        return min(extract_config["no_cores"], cores_per_rank)
+    return cores_per_rank
+
+def get_cores_per_rank(ranks_per_node):
+    """Returns the cores available to this process divided between the 
+    ranks_per_node ranks on the node (at least 1)."""
+
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    return max(cores // max(ranks_per_node, 1), 1)
+
+def _split_reaches(offsets, num_tasks):
+    """Returns ranges of consecutive reaches that split the nodes between
+    offsets[0] and offsets[-1] into at most num_tasks similar parts."""
+
+    num_reaches = offsets.shape[0] - 1
+    bounds = np.searchsorted(offsets, np.linspace(offsets[0], offsets[-1], num_tasks + 1))
+    bounds = np.unique(np.clip(bounds, 0, num_reaches))
+    bounds[0], bounds[-1] = 0, num_reaches
+    return [range(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+def _calculate_task(paths, offsets, reaches):
+    """Calculate the slopes of the reaches range from shared arrays and write
+    them to the shared slope array."""
+
+    wse = np.load(paths["wse"], mmap_mode = "r")
+    distances = np.load(paths["distances"], mmap_mode = "r")
+    slopes = np.load(paths["slopes"], mmap_mode = "r+")
+    slopes[reaches.start:reaches.stop] = calculate_reach_slopes(wse, distances, offsets, reaches)
+    slopes.flush()
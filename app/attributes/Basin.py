@@ -0,0 +1,94 @@
+# Standard imports
+from collections.abc import Mapping
+
+# Third party imports
+import numpy as np
+
+class Basin:
+    """Class that represents the nodes of a basin sorted by reach.
+
+    Node-level data for the whole basin is stored as one contiguous nodes by
+    time array with the nodes of each reach next to each other. A CSR-style
+    offset array gives the rows of each reach.
+
+    Attributes
+    ----------
+        basin_num: str
+            Basin identifier
+        keys: list
+            Reach identifiers (basin_num + '_' + reachid) in sorted order
+        node_ids: ndarray
+            Node identifiers sorted by reach
+        num_nodes: integer
+            Number of nodes in the basin
+        offsets: ndarray
+            Nodes of the reach at position i are rows offsets[i] to offsets[i + 1]
+        order: ndarray
+            Topology file row of each node sorted by reach
+        slices: dictionary
+            Slice of rows organized by reach
+        topology: Topology
+            Topology object that represents topology data
+    """
+
+    def __init__(self, topology, basin_num):
+        self.topology = topology
+        self.basin_num = basin_num
+
+        # Sort nodes by reach keeping topology file order within a reach
+        reach_ids = topology.topo_data["reachid"].to_numpy(dtype = str)
+        unique_ids, reach_pos, counts = np.unique(reach_ids, return_inverse = True,
+            return_counts = True)
+        self.order = np.argsort(reach_pos, kind = "stable")
+        self.node_ids = topology.topo_data.index.to_numpy(dtype = str)[self.order]
+        self.num_nodes = self.order.shape[0]
+
+        # Offsets of each reach in the sorted nodes
+        self.offsets = np.zeros(unique_ids.shape[0] + 1, dtype = np.int64)
+        np.cumsum(counts, out = self.offsets[1:])
+        self.keys = [basin_num + '_' + reach_id for reach_id in unique_ids]
+        self.slices = { key : slice(self.offsets[i], self.offsets[i + 1])
+            for i, key in enumerate(self.keys) }
+
+    def sort_nodes(self, data):
+        """Returns a contiguous copy of data (in topology file order) with rows
+        sorted by reach."""
+
+        return np.ascontiguousarray(np.asarray(data)[self.order])
+
+    def create_array(self, data):
+        """Returns a BasinArray of data (in topology file order) sorted by reach."""
+
+        return BasinArray(self.sort_nodes(data), self)
+
+    def get_node_mask(self, node_list):
+        """Returns a boolean array that is True for sorted nodes in node_list."""
+
+        return np.isin(self.node_ids, np.asarray(node_list, dtype = str))
+
+class BasinArray(Mapping):
+    """Class that represents node-level data for a whole basin sorted by reach.
+
+    Behaves as a read-only dictionary organized by reach where each value is a
+    zero-copy nx by nt view of the reach's rows.
+
+    Attributes
+    ----------
+        basin: Basin
+            Basin object that defines the node order and reach offsets
+        data: ndarray
+            Node-level data with rows sorted by reach
+    """
+
+    def __init__(self, data, basin):
+        self.data = data
+        self.basin = basin
+
+    def __getitem__(self, key):
+        return self.data[self.basin.slices[key]]
+
+    def __iter__(self):
+        return iter(self.basin.keys)
+
+    def __len__(self):
+        return len(self.basin.keys)
@@ -1,21 +1,20 @@
-# Standard imports
-import warnings
-
 # Third party imports
 import numpy as np
 
 # Local imports
-from app.attributes.Utilities import create_reach_dict, extract_node_data_txt
+from app.attributes.Utilities import get_time_window, iter_node_data_txt, read_node_data_txt, \
+    reduce_reaches
+from app.data.config import extract_config
 
 class Discharge:
     """Class that represents discharge data.
 
     Attributes
     ----------
+        basin: Basin
+            Basin object that defines the node order and reach offsets
         file: Path
             Path to .discharge file
-        q_node: dictionary
-            discharge node-level data organized by reach with nx by nt (dataframe) values
         qhat_reach: dictionary
             Prior mean discharge for each reach (scalar)
         qsd_reach: dictionary
@@ -24,44 +23,114 @@ class Discharge:
             Topology object that represents topology data
     """
 
-    def __init__(self, file, topology, basin_num, invalid_nodes):
+    def __init__(self, file, basin, invalid_nodes, input_cache = None):
         self.file = file
+        self.basin = basin
+        self.topology = basin.topology
+        invalid_mask = self.basin.get_node_mask(invalid_nodes[basin.basin_num])
+        block_rows = extract_config["discharge_block_rows"]
+        window = get_time_window()
 
-        # Obtain discharge data in a dataframe
-        self.topology = topology
-        q_node = extract_node_data_txt(self.file, "Time;", self.topology)
-
-        # Remove first 500 time steps
-        q_node = q_node.iloc[:, 500:9862]
+        # Parsed discharge data for every time step is memory mapped from the
+        # input cache and limited to the time window
+        q_node = None
+        if input_cache is not None:
+            q_node = input_cache.read("discharge", [self.file],
+                lambda: { "node" : read_node_data_txt(self.file, self.topology.num_nodes, 
+                    phrase = "Time;")[1] })["node"][:, window]
 
-        # Replace invalid nodes with NaN values
-        q_node.loc[invalid_nodes[basin_num], :] = np.nan
-        
         # Calculate SWORD of Science data: Qhat and Qsd organized by reach
-        q_node = create_reach_dict(q_node, self.topology, basin_num)
-        sword_data = _calculate_qhat_qsd(q_node)
+        if extract_config["stream_discharge"]:
+            if q_node is None:
+                blocks = iter_node_data_txt(self.file, self.basin.num_nodes, "Time;", block_rows,
+                    rows = window)
+            else:
+                blocks = _iter_array_blocks(q_node, block_rows)
+            moments = _stream_moments(blocks, self.basin, invalid_mask)
+            sword_data = _create_sword_data(moments, self.basin.keys)
+        else:
+            # Obtain discharge data in the time window
+            if q_node is None:
+                _, q_node = read_node_data_txt(self.file, self.topology.num_nodes, phrase = "Time;",
+                    rows = window)
+
+            # Sort nodes by reach
+            q_node = self.basin.create_array(q_node)
+
+            # Replace invalid nodes with NaN values
+            q_node.data[invalid_mask] = np.nan
+            sword_data = _calculate_qhat_qsd(q_node)
+
         self.qhat_reach = sword_data["qhat_reach"]
         self.qsd_reach = sword_data["qsd_reach"]
 
 def _calculate_qhat_qsd(discharge_data):
-    """Calculate qhat and qsd attributes using discharge_data parameter and 
-    returns a dictionary organized by reach."""
-
-    qhat_reach_dict = {}
-    qsd_reach_dict = {}
-    for key, value in discharge_data.items():
-
-        # Handle RuntimeWarnings for cases where value contains all NaNs
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=RuntimeWarning)
-
-            # Calculate the mean
-            mean = np.nanmean(value.values)
-            qhat_reach_dict[key] = mean
-            
-            # Calculate the standard deviation
-            sd = np.nanstd(value.values)
-            qsd_reach_dict[key] = sd
+    """Calculate qhat and qsd attributes using discharge_data BasinArray 
+    parameter and returns a dictionary organized by reach."""
+
+    moments = _calculate_moments(discharge_data.data, discharge_data.basin.offsets)
+    return _create_sword_data(moments, discharge_data.basin.keys)
+
+def _iter_array_blocks(node_data, block_rows):
+    """Yields the index of the first time step and a rows by nodes array for
+    each block of block_rows time steps of a nodes by time step array."""
+
+    for i in range(0, node_data.shape[1], block_rows):
+        yield i, node_data[:, i:i + block_rows].T
+
+def _stream_moments(blocks, basin, invalid_mask):
+    """Calculate the count, mean and sum of squared deviations of each reach 
+    from blocks of time steps (tuples of the first time step and a rows by 
+    nodes array), keeping only the running moments in memory."""
+
+    num_reaches = len(basin.keys)
+    moments = (np.zeros(num_reaches), np.zeros(num_reaches), np.zeros(num_reaches))
+    for _, block in blocks:
+
+        # Sort nodes by reach and replace invalid nodes with NaN values
+        data = block[:, basin.order].T
+        data[invalid_mask] = np.nan
+        moments = _merge_moments(moments, _calculate_moments(data, basin.offsets))
+
+    return moments
+
+def _calculate_moments(data, offsets):
+    """Calculate the count, mean and sum of squared deviations (M2) of the 
+    valid values of each reach in nodes by time step data sorted by reach."""
+
+    # Mean and variance of each reach at each time step
+    stats = reduce_reaches(data, offsets, ("count", "mean", "var"))
+    count = stats["count"]
+    time_mean = np.where(count > 0, stats["mean"], 0.0)
+    time_m2 = np.where(count > 0, stats["var"], 0.0) * count
+
+    # Combine time steps into the moments of each reach
+    total = count.sum(axis = 1)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        mean = np.where(total > 0, (time_mean * count).sum(axis = 1) / total, 0.0)
+    m2 = time_m2.sum(axis = 1) + (count * (time_mean - mean[:, np.newaxis]) ** 2).sum(axis = 1)
+    return total, mean, m2
+
+def _merge_moments(moments_a, moments_b):
+    """Merge two sets of reach count, mean and M2 moments (Chan et al.)."""
+
+    count_a, mean_a, m2_a = moments_a
+    count_b, mean_b, m2_b = moments_b
+    count = count_a + count_b
+    delta = mean_b - mean_a
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        mean = np.where(count > 0, mean_a + delta * count_b / count, 0.0)
+        m2 = np.where(count > 0, m2_a + m2_b + delta * delta * count_a * count_b / count, 0.0)
+    return count, mean, m2
+
+def _create_sword_data(moments, keys):
+    """Create qhat (mean) and qsd (population standard deviation) dictionaries 
+    organized by reach from reach moments."""
+
+    count, mean, m2 = moments
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        qhat = np.where(count > 0, mean, np.nan)
+        qsd = np.where(count > 0, np.sqrt(m2 / count), np.nan)
     
-    return { "qhat_reach" : qhat_reach_dict, 
-                "qsd_reach" :  qsd_reach_dict }
\ No newline at end of file
+    return { "qhat_reach" : dict(zip(keys, qhat)), 
+                "qsd_reach" :  dict(zip(keys, qsd)) }
@@ -1,21 +1,29 @@
 # Standard imports
 import warnings
 
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Local imports
+from app.attributes.Basin import BasinArray
+from app.attributes.Utilities import reduce_reaches
+
 class Dxarea:
     """Class that represents d_x_area data.
 
     Attributes
     ----------
-        dxarea_node: dictionary
-           d_x_area node-level data organized by reach with nx by nt (dataframe) values
+        dxarea_node: BasinArray
+           d_x_area node-level data organized by reach with nx by nt (ndarray view) values
         dxarea_reach: dictionary
            d_x_area reach-level data organized by reach with 1 by nt (series) values
         topology: Topology
             Topology object that represents topology data
         width: Width
-            Width object that contains a dataframe of width data
+            Width object that contains width data
         wse: Wse
-            Wse object that contains a dataframe of wse data
+            Wse object that contains wse data
     """
 
     def __init__(self, width, wse, topology):
@@ -26,35 +34,46 @@ class Dxarea:
         self.dxarea_reach = self._create_dxa_reach_dict()
 
     def _create_dxa_node_dict(self):
-        """Create a dictionary of d_x_area node values organized by reach."""
+        """Create a BasinArray of d_x_area node values organized by reach."""
 
-        # Extract wse and width values to calculate d_x_area and store in a dictionary
-        dxa_dict = {}
-        for key, value in self.width.width_node.items():
-            wse = self.wse.wse_node[key]
-            dxa_dict[key] = _calculate_dxa(wse, value)
-        
-        return dxa_dict
+        return _calculate_dxa_node(self.wse.wse_node, self.width.width_node)
 
     def _create_dxa_reach_dict(self):
         """Create a dictionary of d_x_area reach values organized by reach."""
 
-        reach_dict = {}
-        for key, value in self.width.width_reach.items():
-            wse = self.wse.wse_reach[key]
-            reach_dict[key] = _calculate_dxa(wse, value)
+        # Stack reach-level wse and width into reach by time step matrices
+        keys = list(self.width.width_reach.keys())
+        if not keys:
+            return {}
+        wse = np.vstack([self.wse.wse_reach[key] for key in keys])
+        width = np.vstack([self.width.width_reach[key] for key in keys])
+        
+        dxa = _calculate_dxa_reach(wse, width)
+        return { key : pd.Series(dxa[i]) for i, key in enumerate(keys) }
 
-        return reach_dict
+def _calculate_dxa_node(wse, width):
+    """Calculate dA data for every node in the basin using wse and width 
+    BasinArrays."""
 
-def _calculate_dxa(wse, width):
-        """Calculate dA data using width and wse attributes."""
+    # Subtract the median wse of each reach at each time step from all wse values
+    basin = wse.basin
+    median = reduce_reaches(wse.data, basin.offsets, ("median",))["median"]
+    dxa = wse.data - np.repeat(median, np.diff(basin.offsets), axis = 0)
 
-        # Subtract median wse across time level from all wse values
-        # Ignore RuntimeWarning: Mean of empty slice
-        dH = None
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore", category=RuntimeWarning)
-            dH = wse.subtract(wse.median(axis = 0, skipna = True))
-        
-        # Multiple width by change in wse
-        return width.multiply(dH)
\ No newline at end of file
+    # Multiple width by change in wse
+    dxa *= width.data
+    return BasinArray(dxa, basin)
+
+def _calculate_dxa_reach(wse, width):
+    """Calculate dA data for every reach using reach by time step wse and width
+    matrices."""
+
+    # Subtract median wse of each reach across time from all wse values
+    # Ignore RuntimeWarning: All-NaN slice encountered
+    dH = None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        dH = wse - np.nanmedian(wse, axis = 1)[:, np.newaxis]
+    
+    # Multiple width by change in wse
+    return dH * width
@@ -1,145 +1,263 @@
-# Standard imports
-from itertools import repeat
-from multiprocessing import Pool
-
 # Third party imports
-from geopy.distance import geodesic
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
+from pyproj import Geod
+try:
+    import numba
+    from numba import prange
+except ImportError:
+    numba = None
+    prange = range
 
 # Local imports
+from app.attributes.Utilities import broadcast_time_values
 from app.data.config import extract_config
+from app.DistanceCache import DistanceCache
 
 class Slope:
     """Class that represents slope data.
     
     Attributes
     ----------
-        coord_dict: dictionary
-            slope coordinate data organized by reach
+        distance_dict: dictionary
+            distance of each node from the start node organized by reach
+        GEOD: Geod
+            Class attribute that calculates geodesics on the WGS84 ellipsoid
+        pool: SlopePool
+            persistent worker processes that calculate reach slopes or None to
+            calculate them in this process
         slope_node: dictionary
-            slope node-level data organized by reach with nx by nt (dataframe) values
+            slope node-level data organized by reach with nx by nt (read-only 
+            broadcast view of the reach slope) values
         slope_reach: dictionary
             slope reach-level data organized by by reach with 1 by nt (series) values
-        wse_node: dictionary
-            wse node-level data organized by reach with nx by nt (dataframe) values
-        TIME_STEPS: integer
-            Class attribute that stores the number of time steps
+        wse_node: BasinArray
+            wse node-level data organized by reach with nx by nt (ndarray view) values
         topology: Topology
             Topology object that represents topology data
     """
 
-    TIME_STEPS = 9862
+    GEOD = Geod(ellps = "WGS84")
 
-    def __init__(self, topology, wse_node, basin_num, invalid_nodes):
+    def __init__(self, topology, wse_node, basin_num, invalid_nodes, pool = None):
 
         self.topology = topology
         self.wse_node = wse_node
+        self.pool = pool
 
-        # Remove invalid nodes from topology and organize by reachid
-        coord_df = list(topology.topo_data.groupby("reachid"))
-        self.coord_dict = { basin_num + '_' + element[0] : element[1] for element in coord_df }
+        # Distance of each node from the start node of its reach
+        self.distance_dict = self._create_distance_dict(basin_num)
 
         # Use coordinate data and wse data to calculate slope (reach and node)
         self.slope_reach = self._create_reach_dict() 
         self.slope_node = self._create_node_dict()
 
+    def _create_distance_dict(self, basin_num):
+        """Calculates node distances or loads them from the distance cache if enabled."""
+
+        if not extract_config["distance_cache_dir"]:
+            return _create_basin_distance_dict(self.topology.topo_data, basin_num)
+
+        # Load distances cached for the current topology file content
+        cache = DistanceCache(extract_config["distance_cache_dir"],
+            extract_config["distance_cache_max_bytes"], 
+            extract_config["distance_cache_max_files"])
+        cache_file = cache.get_path(basin_num, self.topology.file)
+        distances = cache.load(cache_file, self.topology.topo_data.shape[0])
+
+        # Rebuild missing or stale distances
+        if distances is None:
+            distances = _calculate_basin_distances(self.topology.topo_data)
+            cache.save(cache_file, distances)
+
+        return _create_basin_distance_dict(self.topology.topo_data, basin_num, distances)
+
     def _create_reach_dict(self):
         """Uses linear regression to calculate the reach-level slope."""
 
-        # Determine the slope in parallel for each reach
-        temp_list = []
-        coord_iter = repeat(self.coord_dict, times = len(self.wse_node.items()))
-        wse_coord_iter = zip(self.wse_node.items(), coord_iter)
-        with Pool(extract_config["no_cores"]) as pool:
-            temp_list = pool.starmap(_calculate_reach, wse_coord_iter)
-
-        # Convert results of parallel processing into a dictionary with key of reachid
-        reach_dict = { element[0] : element[1] for element in temp_list }
+        # Determine the slope of each reach in this process
+        if self.pool is None:
+            temp_list = [_calculate_reach(item, self.distance_dict[item[0]]) 
+                for item in self.wse_node.items()]
+            return { element[0] : element[1] for element in temp_list }
 
-        return reach_dict
+        # Determine the slope in parallel for the whole basin sorted by reach
+        basin = self.wse_node.basin
+        distances = np.concatenate([self.distance_dict[key].to_numpy() for key in basin.keys])
+        slopes = self.pool.calculate(self.wse_node.data, distances, basin.offsets)
+        return { key : pd.Series(slopes[i]) for i, key in enumerate(basin.keys) }
     
     def _create_node_dict(self):
-        """Appends reach-level slope values to the node to produce an nx by nt matrix."""
+        """Creates a read-only view of reach-level slope values repeated for 
+        each node to produce an nx by nt matrix without copying them."""
 
         node_dict = {}
         for key, value in self.slope_reach.items():
-            # Repeat reach slope values to fit a nx by nt matrix
-            value_tile = np.tile(value.to_numpy(), (self.wse_node[key].shape[0], 1))
-
-            # Create a dataframe with repeated values
-            node_df = pd.DataFrame(value_tile)
-            
-            # Rename columns to match time steps for other data
-            node_df.columns = np.arange(500, Slope.TIME_STEPS)
-            
-            # Insert node identifiers as an index to the dataframe
-            node_df.insert(0, "nodeid", self.coord_dict[key].index.to_numpy())
-            node_df.set_index("nodeid", inplace = True)
-            
-            # Apply a mask of wse NaN values to slope node df
-            node_df.mask(self.wse_node[key].isna(), np.nan, inplace=True)
-
-            # Save node level data
-            node_dict[key] = node_df
+            node_dict[key] = broadcast_time_values(value.to_numpy(), self.wse_node[key].shape[0])
 
         return node_dict
 
-def _calculate_reach(wse_node_dict, coord_dict):
+    def get_node_matrix(self, key):
+        """Returns the nx by nt node-level slope matrix for reach key with NaN 
+        values wherever wse is NaN."""
+
+        wse = np.asarray(self.wse_node[key], dtype = np.float64)
+        return np.where(np.isnan(wse), np.nan, self.slope_node[key])
+
+    def get_basin_matrix(self):
+        """Returns the node-level slope matrix for every node in the basin 
+        sorted by reach with NaN values wherever wse is NaN."""
+
+        basin = self.wse_node.basin
+        slope = np.vstack([self.slope_reach[key].to_numpy() for key in basin.keys])
+        slope = np.repeat(slope, np.diff(basin.offsets), axis = 0)
+        slope[np.isnan(self.wse_node.data)] = np.nan
+        return slope
+
+def _calculate_reach(wse_node_dict, node_distances):
         """Run a linear regression on distance and height data to determine slope."""
         
-        # Get distances from each node to the start node (first in reach)
-        node_distances = _create_node_distance_list(coord_dict[wse_node_dict[0]])
-        
-       # Run linear regression on each time step
-        slope_series = wse_node_dict[1].apply(_apply_linear_regression, node_dist = node_distances)
+        # Run linear regression on every time step at once
+        slope_series = _calculate_slope_series(wse_node_dict[1], node_distances)
         
         # Return a list of reachid and slope values
         return [wse_node_dict[0], slope_series]
 
-def _create_node_distance_list(coord_df):
-    """Calculate the distance of each node from the start node."""
-    
-    # Define start node and set distance to 0 for start node
-    start_node = coord_df.iloc[0]
+def _calculate_basin_distances(topo_data):
+    """Calculate the distance of every node in the basin from the start node
+    (first in reach) of its reach in one batched call."""
 
-    # Run a function to calculate distance on each row in the value DF
-    distance_df = coord_df.apply(_calculate_distance, 
-                            axis = 1, start_node = start_node)
-    return distance_df
+    # Pair each node with the coordinates of its reach's start node
+    start_node = topo_data.groupby("reachid")[["lat", "lon"]].transform("first")
 
-def _calculate_distance(row, start_node):
-        """Calculates the distance between the start_node and the node found at 
-        the row parameter."""
+    # Geodesic distances on the WGS84 ellipsoid for the whole basin
+    _, _, distance = Slope.GEOD.inv(start_node["lon"].to_numpy(), start_node["lat"].to_numpy(),
+        topo_data["lon"].to_numpy(), topo_data["lat"].to_numpy())
+    return distance
 
-        # Start node latitude and longitude
-        start = (start_node["lat"], start_node["lon"])
-        
-        # Current node latitude and longitude
-        current = (row["lat"], row["lon"])
-        
-        # Return the distance
-        return geodesic(start, current).meters
+def _create_basin_distance_dict(topo_data, basin_num, distances = None):
+    """Organize basin node distances by reachid, calculating them if distances
+    is None."""
 
-def _apply_linear_regression(column, node_dist):
-    """Apply linear regression on column (time step) and node distance."""
+    if distances is None:
+        distances = _calculate_basin_distances(topo_data)
+    distance = pd.Series(distances, index = topo_data.index)
 
-    # Dependent variable (y) - heights
-    height = column.to_numpy()
-    
-    # Mask out NaNs and return NaN if no height data is present
+    # Organize distances by reachid
+    distance_df = list(distance.groupby(topo_data["reachid"]))
+    return { basin_num + '_' + element[0] : element[1] for element in distance_df }
+
+def _calculate_slope_series(wse_df, node_dist):
+    """Calculate the slope of height against node distance for every time step."""
+
+    # Return slope as a series of time steps
+    return pd.Series(calculate_slope(np.asarray(wse_df, dtype = np.float64), 
+        np.asarray(node_dist, dtype = np.float64)))
+
+def calculate_reach_slopes(wse, distances, offsets, reaches):
+    """Returns a matrix of the slope at every time step of each reach in the
+    reaches range from node by time step wse and node distances sorted by 
+    reach, where the nodes of reach i are offsets[i] to offsets[i + 1]."""
+
+    slopes = np.empty((len(reaches), wse.shape[1]), dtype = np.float64)
+    for row, i in enumerate(reaches):
+        nodes = slice(offsets[i], offsets[i + 1])
+        slopes[row] = calculate_slope(wse[nodes], distances[nodes])
+    return slopes
+
+def calculate_slope(height, distance):
+    """Returns the slope of node by time step height (y) against node 
+    distance (x) for every time step as an array.
+
+    Each time step (column) is an ordinary least squares fit of height on
+    distance computed in closed form from sums over the valid (non-NaN)
+    heights. Time steps with fewer than 5 valid heights are NaN.
+
+    Uses a compiled kernel that runs time steps in parallel when numba is
+    installed and use_numba is set in the config file, otherwise NumPy; 
+    both sum nodes in the same order so the results are identical.
+    """
+
+    # Center distances to limit cancellation in the sums (slope is shift invariant)
+    distance = distance - distance.mean()
+    if _calculate_slope_jit is None or not extract_config["use_numba"]:
+        return _calculate_slope_numpy(height, distance)
+
+    # Processes that fork must never start numba's threading layer
+    kernel = _calculate_slope_jit if _kernel_threads > 1 else _calculate_slope_serial_jit
+    return kernel(np.ascontiguousarray(height, dtype = np.float64), distance)
+
+def set_kernel_threads(threads):
+    """Set the number of threads used by the compiled slope kernel in this 
+    process.
+
+    More than one thread starts numba's threading layer, after which the
+    process must not fork (e.g. to start a SlopePool).
+    """
+
+    global _kernel_threads
+    _kernel_threads = max(threads, 1)
+    if numba is not None and threads > 1:
+        numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+
+def _calculate_slope_numpy(height, distance):
+    """Returns the slope of height against centered distance for every time
+    step using NumPy."""
+
+    # Mask out NaNs so they do not contribute to any of the sums
     mask = ~np.isnan(height)
-    height = height[mask]
-    if len(height) < 5:
-        return np.nan
+    count = mask.sum(axis = 0)
+    x = np.where(mask, distance[:, np.newaxis], 0.0)
+    y = np.where(mask, height, 0.0)
+    sum_x = x.sum(axis = 0)
+    sum_y = y.sum(axis = 0)
+    sum_xy = (x * y).sum(axis = 0)
+    sum_xx = (x * x).sum(axis = 0)
 
-    # Independent variable (x) - node distances
-    node_dist = node_dist.to_numpy()[mask]
-    distance = node_dist.reshape((-1, 1))
-    
-    # Create and fit Linear Regression model
-    model = LinearRegression().fit(distance, height)
-    
-    # Return slope
-    return -model.coef_[0]
\ No newline at end of file
+    # Slope = (n*Sxy - Sx*Sy) / (n*Sxx - Sx^2); a constant distance has zero slope
+    numerator = count * sum_xy - sum_x * sum_y
+    denominator = count * sum_xx - sum_x * sum_x
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        slope = np.where(denominator != 0, numerator / denominator, 0.0)
+    slope[count < 5] = np.nan
+    return -slope
+
+def _calculate_slope_loop(height, distance):
+    """Returns the slope of height against centered distance for every time
+    step with explicit loops over time steps (in parallel) and nodes."""
+
+    num_nodes, num_steps = height.shape
+    slope = np.empty(num_steps)
+    for t in prange(num_steps):
+
+        # Sums over the valid heights in node order
+        count = 0
+        sum_x = sum_y = sum_xy = sum_xx = 0.0
+        for i in range(num_nodes):
+            y = height[i, t]
+            if not np.isnan(y):
+                x = distance[i]
+                count += 1
+                sum_x += x
+                sum_y += y
+                sum_xy += x * y
+                sum_xx += x * x
+
+        numerator = count * sum_xy - sum_x * sum_y
+        denominator = count * sum_xx - sum_x * sum_x
+        if count < 5:
+            slope[t] = np.nan
+        elif denominator != 0:
+            slope[t] = -(numerator / denominator)
+        else:
+            slope[t] = -0.0
+    return slope
+
+# Compiled kernels that run time steps in parallel or in one thread
+_calculate_slope_jit = None if numba is None else \
+    numba.njit(parallel = True, cache = True, error_model = "numpy")(_calculate_slope_loop)
+_calculate_slope_serial_jit = None if numba is None else \
+    numba.njit(cache = True, error_model = "numpy")(_calculate_slope_loop)
+
+# Number of slope kernel threads in this process
+_kernel_threads = 1
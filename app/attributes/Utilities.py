@@ -1,54 +1,240 @@
+# Standard imports
+import hashlib
+import mmap
+import os
+from pathlib import Path
+import tempfile
+
 # Third party imports
+import numpy as np
 import pandas as pd
 import shapefile as shp
 
+# Local imports
+from app.data.config import extract_config
+
 """extract utilities for working with matrices and data present in the different
 test data files."""
 
-def create_mean_series(df_dict):
-    """Returns a Series of mean values over time for the dataframe dictionary parameter."""
+def get_time_window():
+    """Returns a slice of the time steps of .stage and .discharge files that
+    are kept, set by time_window (start, stop and optional stride) in the 
+    config file."""
+
+    window = extract_config["time_window"]
+    start, stop, stride = window["start"], window["stop"], window.get("stride", 1)
+    if start < 0 or stop <= start or stride < 1:
+        raise ValueError(f"Invalid time window: {window}")
+    return slice(start, stop, stride)
+
+def get_time_steps():
+    """Returns a range of the kept time steps counted from the start of the
+    time window."""
+
+    window = get_time_window()
+    return range(0, window.stop - window.start, window.step)
+
+def broadcast_node_values(values, num_time_steps):
+    """Returns a read-only nx by nt view that repeats each node value in the
+    values parameter across num_time_steps without copying it."""
+
+    values = np.asarray(values, dtype = np.float64)
+    return np.broadcast_to(values[:, np.newaxis], (values.shape[0], num_time_steps))
+
+def broadcast_time_values(values, num_nodes):
+    """Returns a read-only nx by nt view that repeats the time step values in 
+    the values parameter for num_nodes without copying it."""
+
+    values = np.asarray(values, dtype = np.float64)
+    return np.broadcast_to(values[np.newaxis, :], (num_nodes, values.shape[0]))
+
+def create_mean_series(basin_array):
+    """Returns a Series of mean values over time for each reach in the BasinArray parameter."""
     
-    reach_dict = {}
-    reach_dict = { key : value.mean(axis = 0) for key, value in df_dict.items() }
+    mean = reduce_reaches(basin_array.data, basin_array.basin.offsets, ("mean",))["mean"]
+    reach_dict = { key : pd.Series(mean[i]) for i, key in enumerate(basin_array.basin.keys) }
 
     return reach_dict
 
-def create_reach_dict(df, topology, basin_num):
-    """Creates a dictionary of dataframes with a key of reachid."""
+def reduce_reaches(data, offsets, stats = ("mean", "count")):
+    """Computes NaN-aware reductions over the nodes of every reach in one pass.
 
-    # Add topology index (reachid) and link columns
-    df.insert(0, "reachid", topology.topo_data["reachid"])
+    The rows of data are nodes sorted by reach so that the rows of reach i are
+    offsets[i] to offsets[i + 1]. Returns a dictionary of statistic name keys
+    with an array value of one row per reach. Available statistics are "count",
+    "sum", "mean", "var" (population variance), "std" (population standard 
+    deviation) and "median". Every reach must have at least one node. Reaches 
+    with no valid values are NaN for every statistic except count and sum.
+    """
 
-    # Group by reachid, store dataframe in a dictionary organized by reachid
-    df = list(df.groupby("reachid"))
-    df_dict = { basin_num + '_' + element[0] : element[1] for element in df }
+    data = np.asarray(data, dtype = np.float64)
+    starts = np.asarray(offsets)[:-1]
+    lengths = np.diff(offsets)
+    valid = ~np.isnan(data)
 
-    # Remove reachid from dataframe value
-    for value in df_dict.values():
-        value.drop(labels = ["reachid"], axis = 1, inplace = True)
-    
-    return df_dict
+    results = {}
+    count = _reduce_sum(valid.astype(np.int64), starts)
+    total = _reduce_sum(np.where(valid, data, 0.0), starts)
+    with np.errstate(divide = "ignore", invalid = "ignore"):
+        mean = np.where(count > 0, total / count, np.nan)
+    if "count" in stats: results["count"] = count
+    if "sum" in stats: results["sum"] = total
+    if "mean" in stats: results["mean"] = mean
 
-def extract_node_data_txt(file, phrase, topology):
-    """Extracts data for each node from file attribute for text files."""
+    # Variance from squared deviations from each reach mean
+    if "var" in stats or "std" in stats:
+        deviation = np.where(valid, data - np.repeat(mean, lengths, axis = 0), 0.0)
+        with np.errstate(divide = "ignore", invalid = "ignore"):
+            var = np.where(count > 0, _reduce_sum(deviation * deviation, starts) / count, np.nan)
+        if "var" in stats: results["var"] = var
+        if "std" in stats: results["std"] = np.sqrt(var)
 
-    # Import stage data as a dataframe
-    header_end = get_line_num(file, phrase) + 1
-    data = pd.read_csv(file,
-        skiprows = range(0, header_end), 
-        header = None, 
-        delim_whitespace = True)
-    
-    # Drop the time column and transpose matrix
-    data.drop(0, inplace = True, axis = 1)
-    data = data.transpose()
+    if "median" in stats:
+        results["median"] = _reduce_median(data, starts, lengths, count)
 
-    # Add an explicit node identifier index
-    data.insert(0, "nodeid", topology.topo_data.index.to_numpy())
-    data = data.astype({"nodeid": str})
-    data.set_index("nodeid", inplace = True)
+    return results
 
-    return data
+def _reduce_sum(values, starts):
+    """Sums the rows of values from each start to the next."""
+
+    return np.add.reduceat(values, starts, axis = 0)
+
+def _reduce_median(data, starts, lengths, count):
+    """Computes the NaN-aware median of every reach by sorting values within 
+    each reach (NaN values sort last) and selecting the middle valid values."""
+
+    reach_pos = np.repeat(np.arange(starts.shape[0]), lengths)
+    reach_pos = np.broadcast_to(reach_pos.reshape((-1,) + (1,) * (data.ndim - 1)), data.shape)
+    sorted_data = np.take_along_axis(data, np.lexsort((data, reach_pos), axis = 0), axis = 0)
+
+    # Positions of the lower and upper middle valid values of each reach
+    starts = starts.reshape((-1,) + (1,) * (data.ndim - 1))
+    lower = starts + np.maximum(count - 1, 0) // 2
+    upper = starts + count // 2
+    median = (np.take_along_axis(sorted_data, lower, axis = 0) 
+        + np.take_along_axis(sorted_data, upper, axis = 0)) / 2
+    return np.where(count > 0, median, np.nan)
+
+def read_node_data_txt(file, num_nodes, phrase = None, base_phrase = None, 
+    block_rows = 256, rows = None):
+    """Reads the sections of a .stage or .discharge text file in a single pass.
+
+    Section markers are located by byte offset in a memory map of the file and
+    the whitespace-delimited numbers that follow are parsed directly into 
+    preallocated arrays.
+
+    Returns a tuple of the num_nodes by 4 (node, x, y, elev) block that follows 
+    base_phrase and the num_nodes by nt block that follows phrase with the time 
+    column removed. A section is None if its phrase is None. If rows is a 
+    slice only those time steps are parsed and the rest are skipped.
+    """
+
+    base_data = None
+    node_data = None
+    with open(file, "rb") as f, mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+        
+        # Base data: one row of node, x, y, elev for each node
+        if base_phrase is not None:
+            start = _find_section(mm, base_phrase, file)
+            end = start
+            for _ in range(num_nodes):
+                end = _find_line_end(mm, end) + 1
+            base_data = _parse_block(mm[start:end], num_nodes, 4, file)
+
+        # Time series data: one row of time followed by a value for each node
+        if phrase is not None:
+            start = _find_section(mm, phrase, file)
+            row_offsets = _find_row_offsets(mm, start, _get_max_rows(rows))
+            num_rows = len(_select_rows(row_offsets, rows))
+            node_data = np.empty((num_nodes, num_rows), dtype = np.float64)
+            for i, block in _iter_row_blocks(mm, row_offsets, num_nodes, block_rows, file, rows):
+                node_data[:, i:i + block.shape[0]] = block.T
+
+    return base_data, node_data
+
+def iter_node_data_txt(file, num_nodes, phrase, block_rows = 256, rows = None):
+    """Yields the time series section that follows phrase in a .stage or 
+    .discharge text file in blocks of rows without reading the whole section
+    into memory.
+
+    Each block is a tuple of the index of its first row and a rows by 
+    num_nodes array with the time column removed. If rows is a slice only 
+    those time steps are parsed and row indexes count from the first of them.
+    """
+
+    with open(file, "rb") as f, mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ) as mm:
+        row_offsets = _find_row_offsets(mm, _find_section(mm, phrase, file), _get_max_rows(rows))
+        yield from _iter_row_blocks(mm, row_offsets, num_nodes, block_rows, file, rows)
+
+def _iter_row_blocks(mm, row_offsets, num_nodes, block_rows, file, rows = None):
+    """Yields the index of the first row and a rows by num_nodes array for 
+    each block of block_rows selected rows with the time column removed."""
+
+    selected = _select_rows(row_offsets, rows)
+    for i in range(0, len(selected), block_rows):
+        block_range = selected[i:i + block_rows]
+
+        # Contiguous rows are one slice of the file; strided rows are joined
+        if block_range.step == 1:
+            text = mm[row_offsets[block_range.start]:row_offsets[block_range.stop]]
+        else:
+            text = b"".join(mm[row_offsets[j]:row_offsets[j + 1]] for j in block_range)
+        block = _parse_block(text, len(block_range), num_nodes + 1, file)
+        yield i, block[:, 1:]
+
+def _select_rows(row_offsets, rows):
+    """Returns a range of the indexes of the rows selected by the rows slice 
+    (all rows if None) clipped to the rows in row_offsets."""
+
+    all_rows = range(len(row_offsets) - 1)
+    return all_rows if rows is None else all_rows[rows]
+
+def _get_max_rows(rows):
+    """Returns the number of rows that must be located to read the rows 
+    slice or None if every row is needed."""
+
+    return None if rows is None else rows.stop
+
+def _find_section(mm, phrase, file):
+    """Returns the byte offset of the line following the first line that 
+    contains phrase."""
+
+    offset = mm.find(phrase.encode())
+    if offset == -1:
+        raise ValueError(f"Could not find '{phrase}' in {file}")
+    return _find_line_end(mm, offset) + 1
+
+def _find_line_end(mm, offset):
+    """Returns the byte offset of the end of the line that contains offset."""
+
+    end = mm.find(b"\n", offset)
+    return len(mm) if end == -1 else end
+
+def _find_row_offsets(mm, start, max_rows = None):
+    """Returns the byte offset of each row from start to the end of the file 
+    (or the first max_rows rows) followed by the offset of the end of the last 
+    row."""
+
+    # Ignore trailing whitespace so there are no empty rows
+    end = len(mm)
+    while end > start and mm[end - 1:end].isspace():
+        end -= 1
+
+    row_offsets = []
+    offset = start
+    while offset < end and (max_rows is None or len(row_offsets) < max_rows):
+        row_offsets.append(offset)
+        offset = _find_line_end(mm, offset) + 1
+    row_offsets.append(min(offset, end))
+    return row_offsets
+
+def _parse_block(text, num_rows, num_cols, file):
+    """Parses whitespace-delimited numbers in text into a num_rows by num_cols array."""
+
+    block = np.fromstring(text, dtype = np.float64, sep = " ")
+    if block.size != num_rows * num_cols:
+        raise ValueError(f"Expected {num_rows} rows of {num_cols} values in {file}")
+    return block.reshape((num_rows, num_cols))
 
 def extract_node_data_shp(file, topology):
     """Extracts data for each node from file attribute for shapefiles."""
@@ -68,9 +254,24 @@ def extract_node_data_shp(file, topology):
 
     return data
 
-def get_line_num(filename, phrase):
-    with open(filename, 'r') as f:
-        for num, line in enumerate(f):
-            if phrase in line:
-                return num
+def write_atomic(path, write, mode = "wb"):
+    """Call write with a temporary file opened with mode next to path and 
+    replace path with it, so other ranks and runs never read a partial file."""
+
+    fd, tmp_name = tempfile.mkstemp(dir = Path(path).parent, suffix = ".tmp")
+    try:
+        with os.fdopen(fd, mode) as tmp_file:
+            write(tmp_file)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+def hash_file(filename, block_size = 1048576):
+    """Returns the SHA-256 hex digest of the contents of filename."""
 
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
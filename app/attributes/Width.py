@@ -3,58 +3,67 @@ import numpy as np
 import pandas as pd
 
 # Local imports
-from app.attributes.Utilities import create_mean_series, create_reach_dict, extract_node_data_shp
+from app.attributes.Basin import BasinArray
+from app.attributes.Utilities import broadcast_node_values, extract_node_data_shp, get_time_steps, \
+    reduce_reaches
 
 class Width:
     """Class that represents a .slope file.
     
     Attributes
     ----------
+        basin: Basin
+            Basin object that defines the node order and reach offsets
         file: Path
             Path to shapefile for slope data
         topology: Topology
             Topology object that represents topology data
-        TIME_STEPS: integer
-            Class attribute that stores the number of time steps
-        width_node: dictionary
-            width node-level data organized by reach with nx by nt (dataframe) values
+        width_node: BasinArray
+            width node-level data organized by reach with nx by nt (read-only 
+            broadcast view of one value per node) values
         width_reach: dictionary
-            width reach-level data organized by reach with 1 by nt values
+            width reach-level data organized by reach with 1 by nt (series) values
     """
 
-    TIME_STEPS = 9862
-    TIME_STEPS_500 = 9362
-
-    def __init__(self, file, topology, basin_num, invalid_nodes):
+    def __init__(self, file, basin, invalid_nodes, input_cache = None):
         self.file = file
-        self.topology = topology
-        
-        # Replace invalid nodes with NaN and organize dataframe by reach
-        df = extract_node_data_shp(file, self.topology)
-        df.loc[invalid_nodes[basin_num], :] = np.nan
-        df_dict = create_reach_dict(df, self.topology, basin_num)
-
-        # Create node-level and reach-level dataframes for each reach
-        self.width_node = _create_node_dict(df_dict)
-        self.width_reach = create_mean_series(self.width_node)
-
-def _create_node_dict(df_dict):
-    """Append node-level width data to each dataframe in the df_dict parameter."""
-
-    node_dict = {}
-    for key, value in df_dict.items():
-        # Drop coordinate columns
-        value.drop(labels = ["x", "y", "index"], axis = 1, inplace = True)
-        
-        # Repeat width value along columns (time steps)
-        value_tile = np.tile(value.astype("float64").to_numpy(), (1, Width.TIME_STEPS_500))
+        self.basin = basin
+        self.topology = basin.topology
         
-        # Create a dataframe with repeated width data
-        width_df = pd.DataFrame(value_tile, columns = np.arange(500, Width.TIME_STEPS))
-        
-        # Insert node values as an index to the dataframe
-        width_df.insert(0, "node", np.array(value.index))
-        width_df.set_index("node", inplace = True)
-        node_dict[key] = width_df
+        # Read node widths from the shapefile records (.dbf) or the input cache
+        if input_cache is None:
+            width = _read_width(file, self.topology)
+        else:
+            width = input_cache.read("width", [file, file.with_suffix(".dbf")],
+                lambda: { "width" : _read_width(file, self.topology) })["width"]
+
+        # Sort node widths by reach and replace invalid nodes with NaN
+        width = self.basin.sort_nodes(width)
+        width[self.basin.get_node_mask(invalid_nodes[basin.basin_num])] = np.nan
+
+        # Create node-level and reach-level data for each reach
+        self.width_node = _create_node_array(width, self.basin)
+        self.width_reach = _create_reach_dict(width, self.basin)
+
+def _read_width(file, topology):
+    """Returns the width of each node in topology order from a shapefile."""
+
+    df = extract_node_data_shp(file, topology)
+    return df["width"].to_numpy(dtype = np.float64)
+
+def _create_node_array(width, basin):
+    """Create a read-only nx by nt view of the node-level width data sorted by
+    reach without copying it to every time step."""
+
+    return BasinArray(broadcast_node_values(width, len(get_time_steps())), basin)
+
+def _create_reach_dict(width, basin):
+    """Create a series of mean width over time for each reach from node-level 
+    width data sorted by reach."""
+
+    mean = reduce_reaches(width, basin.offsets, ("mean",))["mean"]
+    num_time_steps = len(get_time_steps())
+    reach_dict = { key : pd.Series(np.full(num_time_steps, mean[i])) 
+        for i, key in enumerate(basin.keys) }
 
-    return node_dict
\ No newline at end of file
+    return reach_dict
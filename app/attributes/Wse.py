@@ -1,60 +1,60 @@
 # Third party imports
 import numpy as np
-import pandas as pd
 
 # Local imports
-from app.attributes.Utilities import create_mean_series, create_reach_dict, extract_node_data_txt, get_line_num
+from app.attributes.Utilities import create_mean_series, get_time_window, read_node_data_txt
 
 class Wse:
     """Class that represents wse data.
     
     Attributes
     ----------
+        basin: Basin
+            Basin object that defines the node order and reach offsets
         file : Path
             Path to .stage file
-        wse_node: dictionary
-            wse node-level data organized by reach with nx by nt (dataframe) values
+        wse_node: BasinArray
+            wse node-level data organized by reach with nx by nt (ndarray view) values
         wse_reach: dictionary
             wse reach-level data organized by reach with 1 by nt (series) values
         topology: Topology
             Topology object that represents data found in file
     """
 
-    def __init__(self, file, topology, basin_num, invalid_nodes):
+    def __init__(self, file, basin, invalid_nodes, input_cache = None):
         self.file = file
-        self.topology = topology
+        self.basin = basin
+        self.topology = basin.topology
         
+        # Read base elevation and node elevation in the time window from a 
+        # single pass over the file; cached entries hold every time step
+        window = get_time_window()
+        if input_cache is None:
+            stage = _read_stage(self.file, self.topology.num_nodes, window)
+            base_data, node_data = stage["base"], stage["node"]
+        else:
+            stage = input_cache.read("stage", [self.file], 
+                lambda: _read_stage(self.file, self.topology.num_nodes))
+            base_data, node_data = stage["base"], stage["node"][:, window]
+
         # Add base elevation to node evelation - replacing all zero values with NaN
-        base_data = _extract_base_data(self.file, self.topology)
-        node_data = extract_node_data_txt(self.file, "Time;", self.topology)
-        node_data[np.isclose(node_data.values, 0.0, atol=0.001)] = np.NaN
-        df = node_data.add(base_data["elev"], axis = "index")
+        node_data[np.isclose(node_data, 0.0, atol=0.001)] = np.NaN
+        node_data += base_data[:, 3, np.newaxis]
 
-        # Remove first 500 time steps
-        df = df.iloc[:, 500:9862]
+        # Sort nodes by reach
+        self.wse_node = self.basin.create_array(node_data)
 
         # Replace invalid nodes with NaN
-        df.loc[invalid_nodes[basin_num], :] = np.nan
+        self.wse_node.data[self.basin.get_node_mask(invalid_nodes[basin.basin_num])] = np.nan
 
-        # Create node-level and reach-level dataframes for each reach
-        self.wse_node = create_reach_dict(df, self.topology, basin_num)
+        # Create reach-level series for each reach
         self.wse_reach = create_mean_series(self.wse_node)
 
-def _extract_base_data(file, topology):
-    """Extracts base elevation matrix from file attribute."""
-    
-    # Load dataframe from file
-    header_end = get_line_num(file, "Stage information") + 1
-    base_data = pd.read_csv(file, 
-        skiprows = range(0, header_end), 
-        nrows = len(topology.topo_data.index),
-        header = None, 
-        delim_whitespace = True)
-    base_data.columns = ["node", "x", "y", "elev"]
-    base_data.set_index("node", inplace = True)
-    
-    # Insert nodeid index
-    base_data.insert(0, "nodeid", topology.topo_data.index.to_numpy())
-    base_data.set_index("nodeid", inplace = True)
-    
-    return base_data
\ No newline at end of file
+def _read_stage(file, num_nodes, rows = None):
+    """Returns a dictionary of the base (node, x, y, elev) and node by time step
+    elevation matrices of a .stage file, keeping the time steps in the rows 
+    slice (all if None)."""
+
+    base_data, node_data = read_node_data_txt(file, num_nodes, phrase = "Time;", 
+        base_phrase = "Stage information", rows = rows)
+    return { "base" : base_data, "node" : node_data }
@@ -1,6 +1,27 @@
 extract_config = {
-    "no_cores" : 1,
+    "no_cores" : 0,
+    "use_numba" : True,
     "input_dir" : "",
     "output_dir" : "",
-    "logging_dir" : ""
-}
\ No newline at end of file
+    "logging_dir" : "",
+    "distance_cache_dir" : "",
+    "distance_cache_max_bytes" : 1073741824,
+    "distance_cache_max_files" : 10000,
+    "input_cache_dir" : "",
+    "partition_weights" : { "stage_bytes" : 1.0 },
+    "scheduler" : "static",
+    "prefetch" : False,
+    "stream_discharge" : True,
+    "discharge_block_rows" : 256,
+    "load_threads" : 0,
+    "write_queue_depth" : 0,
+    "manifest_dir" : "",
+    "metrics_dir" : "",
+    "time_window" : { "start" : 500, "stop" : 9862, "stride" : 1 },
+    "products" : ["d_x_area", "slope2", "width", "wse", "Qhat", "Qsd"],
+    "output_layout" : "reach",
+    "output_encoding" : {
+        "node/slope2" : { "zlib" : True, "complevel" : 4, "shuffle" : True },
+        "node/width" : { "zlib" : True, "complevel" : 4, "shuffle" : True }
+    }
+}
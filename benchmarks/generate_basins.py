@@ -0,0 +1,157 @@
+# Standard imports
+import argparse
+import json
+from pathlib import Path
+
+# Third party imports
+import numpy as np
+import shapefile as shp
+
+'''Generates synthetic basins in the input format read by extract so that
+performance can be measured without the benchmark dataset.
+
+Usage: python3 -m benchmarks.generate_basins OUTPUT_DIR [--basins 2]
+    [--reaches 12] [--min-nodes 5] [--max-nodes 60] [--time-steps 9862]
+
+Basin directories are written to OUTPUT_DIR/input and the invalid nodes of
+every basin to OUTPUT_DIR/invalid_nodes.json.'''
+
+NODE_SPACING = 200.0          # metres between nodes along the river
+METRES_PER_DEGREE = 111320.0
+BED_SLOPE = 1e-4              # drop in base elevation per metre downstream
+DAYS_PER_YEAR = 365.25
+
+def generate_basins(output_dir, num_basins = 2, num_reaches = 12, min_nodes = 5,
+    max_nodes = 60, num_time_steps = 9862, invalid_fraction = 0.02,
+    missing_fraction = 0.1, seed = 0):
+    """Write num_basins synthetic basin directories to output_dir/input and an
+    invalid_nodes.json file of the invalid nodes of every basin to output_dir.
+
+    Returns a tuple of the Path to the input directory and the Path to the 
+    invalid node file.
+    """
+
+    input_dir = Path(output_dir) / "input"
+    input_dir.mkdir(parents = True, exist_ok = True)
+    rng = np.random.default_rng(seed)
+    invalid_nodes = {}
+    for i in range(num_basins):
+        basin_num = f"{i + 1:03d}"
+        invalid_nodes[basin_num] = generate_basin(input_dir / basin_num, basin_num,
+            num_reaches, min_nodes, max_nodes, num_time_steps, invalid_fraction,
+            missing_fraction, rng)
+
+    invalid_file = Path(output_dir) / "invalid_nodes.json"
+    with open(invalid_file, "w") as json_file:
+        json.dump(invalid_nodes, json_file)
+    return input_dir, invalid_file
+
+def generate_basin(basin_dir, basin_num, num_reaches, min_nodes, max_nodes,
+    num_time_steps, invalid_fraction, missing_fraction, rng):
+    """Write the topology, stage, discharge and width files of one synthetic
+    basin to basin_dir and return a list of its invalid node identifiers.
+
+    Nodes follow a meandering river downstream; reaches are numbered in a
+    random order as in the benchmark data.
+    """
+
+    basin_dir.mkdir(parents = True, exist_ok = True)
+    sizes = rng.integers(min_nodes, max_nodes + 1, num_reaches)
+    num_nodes = sizes.sum()
+    node_ids = (int(basin_num) * 100000 + np.arange(num_nodes)).astype(str)
+    reach_ids = rng.permutation(num_reaches) + 1
+    node_reaches = np.repeat(reach_ids, sizes)
+    downstream = np.append(reach_ids[1:], 0)
+    node_downstream = np.repeat(downstream, sizes)
+
+    # River path
+    heading = np.cumsum(rng.normal(0, 0.3, num_nodes)) * 0.2
+    lon = 29.0 + np.cumsum(np.cos(heading)) * NODE_SPACING / METRES_PER_DEGREE / np.cos(np.radians(56.4))
+    lat = 56.4 + np.cumsum(np.sin(heading)) * NODE_SPACING / METRES_PER_DEGREE
+    elevation = 200.0 - np.arange(num_nodes) * NODE_SPACING * BED_SLOPE
+
+    # Node width, water depth and discharge over time
+    width = np.repeat(rng.uniform(30, 120, num_reaches), sizes) * rng.uniform(0.8, 1.2, num_nodes)
+    depth = _create_depth(num_nodes, num_time_steps, rng)
+    discharge = 0.5 * width * depth ** (5 / 3) * rng.lognormal(0, 0.05, depth.shape)
+    depth[rng.random(depth.shape) < missing_fraction] = 0.0
+
+    _write_topology(basin_dir / f"{basin_num}_T.csv", node_ids, lon, lat, node_reaches, node_downstream)
+    _write_stage(basin_dir / f"{basin_num}.stage", node_ids, lon, lat, elevation, depth)
+    _write_time_series(basin_dir / f"{basin_num}.discharge", "Discharge information", discharge, "%.3f")
+    _write_width(basin_dir / f"{basin_num}_W", node_ids, lon, lat, width)
+
+    num_invalid = int(round(num_nodes * invalid_fraction))
+    return sorted(rng.choice(node_ids, num_invalid, replace = False).tolist())
+
+def _create_depth(num_nodes, num_time_steps, rng):
+    """Returns a time step by node matrix of water depth with a seasonal cycle
+    that travels downstream and noise that is correlated in time."""
+
+    time = np.arange(num_time_steps)[:, np.newaxis]
+    lag = np.arange(num_nodes)[np.newaxis, :] * 0.05
+    mean_depth = rng.uniform(1.0, 3.0, num_nodes)
+    seasonal = 1 + 0.4 * np.sin(2 * np.pi * (time - lag) / DAYS_PER_YEAR)
+    noise = np.cumsum(rng.normal(0, 0.02, (num_time_steps, 1)), axis = 0)
+    noise -= np.linspace(0, noise[-1, 0], num_time_steps)[:, np.newaxis]
+    return np.clip(mean_depth * seasonal + noise + rng.normal(0, 0.02, (num_time_steps, num_nodes)), 0.05, None)
+
+def _write_topology(file, node_ids, lon, lat, reaches, downstream):
+    """Write a topology CSV file of node, coordinates, reach and downstream reach."""
+
+    with open(file, "w") as csv_file:
+        csv_file.write("index,lon,lat,link,dslink\n")
+        for row in zip(node_ids, lon, lat, reaches, downstream):
+            csv_file.write("%s,%.6f,%.6f,%d,%d\n" % row)
+
+def _write_stage(file, node_ids, lon, lat, elevation, depth):
+    """Write a .stage file of base node data followed by depth time series."""
+
+    with open(file, "w") as stage_file:
+        stage_file.write("Synthetic stage file\nStage information\n")
+        for row in zip(node_ids, lon, lat, elevation):
+            stage_file.write("%s %.4f %.4f %.4f\n" % row)
+    _write_time_series(file, None, depth, "%.4f", mode = "a")
+
+def _write_time_series(file, header, data, value_format, mode = "w"):
+    """Write a "Time;" section of one row of time followed by a value for each
+    node per time step."""
+
+    with open(file, mode) as series_file:
+        if header is not None:
+            series_file.write(header + "\n")
+        series_file.write(f"Time; {data.shape[1]} nodes\n")
+        time = np.arange(1, data.shape[0] + 1, dtype = np.float64)[:, np.newaxis]
+        np.savetxt(series_file, np.hstack([time, data]),
+            fmt = ["%.1f"] + [value_format] * data.shape[1])
+
+def _write_width(file, node_ids, lon, lat, width):
+    """Write a point shapefile with a width record for each node."""
+
+    writer = shp.Writer(str(file), shapeType = shp.POINT)
+    writer.field("x", "N", decimal = 6)
+    writer.field("y", "N", decimal = 6)
+    writer.field("width", "N", decimal = 2)
+    writer.field("index", "N")
+    for node_id, x, y, node_width in zip(node_ids, lon, lat, width):
+        writer.point(x, y)
+        writer.record(x, y, round(float(node_width), 2), int(node_id))
+    writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description = "Generate synthetic basin input files.")
+    parser.add_argument("output_dir", type = Path)
+    parser.add_argument("--basins", type = int, default = 2)
+    parser.add_argument("--reaches", type = int, default = 12)
+    parser.add_argument("--min-nodes", type = int, default = 5)
+    parser.add_argument("--max-nodes", type = int, default = 60)
+    parser.add_argument("--time-steps", type = int, default = 9862)
+    parser.add_argument("--seed", type = int, default = 0)
+    args = parser.parse_args()
+
+    input_dir, invalid_file = generate_basins(args.output_dir, args.basins, args.reaches, 
+        args.min_nodes, args.max_nodes, args.time_steps, seed = args.seed)
+    print(f"Set input_dir to {input_dir} and invalid_node_file to {invalid_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# Standard imports
+import argparse
+import json
+import logging
+import os
+from pathlib import Path
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+from time import perf_counter
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.data.config import extract_config
+from app.Input import Input
+from app.Output import Output
+from app.attributes.Basin import Basin
+from app.attributes.Discharge import Discharge
+from app.attributes.Dxarea import Dxarea
+from app.attributes.Slope import numba, Slope
+from app.attributes.Topology import Topology
+from app.attributes.Width import Width
+from app.attributes.Wse import Wse
+from benchmarks.generate_basins import generate_basins
+
+'''Times each stage of extract on synthetic basins and compares the results
+to a stored baseline.
+
+Usage: python3 -m benchmarks.run_benchmarks [--repeat 3] [--output FILE]
+    [--baseline FILE] [--tolerance 0.25] [--min-seconds 0.05] [--update-baseline]
+
+The process exits with status 1 when a stage is slower than the baseline by
+more than the tolerance and by more than min-seconds. Baselines are specific
+to the machine they were recorded on; record a new one with --update-baseline
+before comparing changes on another machine.'''
+
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+STAGES = ["topology", "wse", "discharge", "width", "slope", "dxarea", "output"]
+
+# Synthetic basins measured by the suite
+PARAMETERS = {
+    "num_basins" : 2,
+    "num_reaches" : 12,
+    "min_nodes" : 5,
+    "max_nodes" : 60,
+    "num_time_steps" : 9862,
+    "seed" : 0
+}
+
+def run_benchmarks(work_dir, repeat):
+    """Returns the minimum and median seconds of each stage summed over the
+    synthetic basins generated in work_dir, repeating each stage repeat
+    times."""
+
+    input_dir, invalid_file = generate_basins(work_dir, **PARAMETERS)
+    extract_config.update({ "invalid_node_file" : str(invalid_file), "input_cache_dir" : "",
+        "distance_cache_dir" : "", "output_layout" : "reach" })
+    logger = logging.getLogger("benchmarks")
+    logger.addHandler(logging.NullHandler())
+
+    times = { stage : [0.0] * repeat for stage in STAGES }
+    for basin_dir in sorted(input_dir.iterdir()):
+        basin_times = _time_basin(Input(basin_dir), Path(work_dir) / "output", repeat, logger)
+        for stage, stage_times in basin_times.items():
+            times[stage] = [total + value for total, value in zip(times[stage], stage_times)]
+
+    return { stage : { "min" : min(values), "median" : statistics.median(values) }
+        for stage, values in times.items() }
+
+def _time_basin(input, output_dir, repeat, logger):
+    """Returns a list of seconds of each repetition of every stage for the
+    basin of input."""
+
+    basin_num = input.basin_num
+    times = {}
+
+    def time_stage(stage, function):
+        """Time repeat calls of function after an untimed call that loads
+        compiled kernels and warms file caches, and return the last result."""
+        result = function()
+        times[stage] = []
+        for _ in range(repeat):
+            start = perf_counter()
+            result = function()
+            times[stage].append(perf_counter() - start)
+        return result
+
+    def create_topology():
+        topology = Topology(input.topology_file)
+        return topology, Basin(topology, basin_num)
+
+    topology, basin = time_stage("topology", create_topology)
+    wse = time_stage("wse", lambda: Wse(input.wse_file, basin, input.invalid_nodes))
+    discharge = time_stage("discharge", lambda: Discharge(input.discharge_file, basin, input.invalid_nodes))
+    width = time_stage("width", lambda: Width(input.width_file, basin, input.invalid_nodes))
+    slope = time_stage("slope", lambda: Slope(topology, wse.wse_node, basin_num, input.invalid_nodes))
+    dxarea = time_stage("dxarea", lambda: Dxarea(width, wse, topology))
+
+    topo_dict = { basin_num + '_' + reach_id : df for reach_id, df in topology.topo_data.groupby("reachid") }
+    data = { "topology" : topo_dict, "basin" : basin, "discharge" : discharge, "dxarea" : dxarea,
+        "slope" : slope, "width" : width, "wse" : wse }
+
+    def write_output():
+        shutil.rmtree(output_dir, ignore_errors = True)
+        output_dir.mkdir(parents = True)
+        Output(data, output_dir, logger).write_output()
+
+    time_stage("output", write_output)
+    return times
+
+def compare_results(stages, baseline, tolerance, min_seconds):
+    """Returns a list of lines that compare the minimum time of each stage to
+    the baseline and a list of the stages that are slower than the baseline
+    by more than tolerance (a fraction) and more than min_seconds."""
+
+    lines = [f"{'stage':<10}{'min (s)':>10}{'median (s)':>12}{'baseline (s)':>14}{'ratio':>8}"]
+    regressions = []
+    for stage, result in stages.items():
+        base = baseline["stages"].get(stage) if baseline is not None else None
+        if base is None:
+            lines.append(f"{stage:<10}{result['min']:>10.3f}{result['median']:>12.3f}{'-':>14}{'-':>8}")
+            continue
+        ratio = result["min"] / base["min"] if base["min"] > 0 else float("inf")
+        slower = ratio > 1 + tolerance and result["min"] - base["min"] > min_seconds
+        flag = "  slower" if slower else ""
+        if flag:
+            regressions.append(stage)
+        lines.append(f"{stage:<10}{result['min']:>10.3f}{result['median']:>12.3f}" \
+            + f"{base['min']:>14.3f}{ratio:>8.2f}{flag}")
+    return lines, regressions
+
+def get_environment():
+    """Returns a dictionary that describes the machine and libraries measured."""
+
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count()
+    return {
+        "machine" : platform.machine(),
+        "processor" : platform.processor(),
+        "cores" : cores,
+        "python" : platform.python_version(),
+        "numpy" : np.__version__,
+        "numba" : None if numba is None else numba.__version__,
+        "use_numba" : extract_config["use_numba"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description = "Time each stage of extract on synthetic basins.")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--output", type = Path, help = "write results to this JSON file")
+    parser.add_argument("--baseline", type = Path, default = BASELINE_FILE)
+    parser.add_argument("--tolerance", type = float, default = 0.25,
+        help = "fraction a stage may be slower than the baseline")
+    parser.add_argument("--min-seconds", type = float, default = 0.05,
+        help = "seconds a stage may be slower than the baseline regardless of tolerance")
+    parser.add_argument("--update-baseline", action = "store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        stages = run_benchmarks(Path(work_dir), args.repeat)
+    results = { "environment" : get_environment(), "parameters" : PARAMETERS, "stages" : stages }
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent = 1))
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(results, indent = 1))
+        print(f"Baseline written to {args.baseline}")
+
+    # Compare to a baseline of the same synthetic basins
+    baseline = None
+    if args.baseline.exists() and not args.update_baseline:
+        baseline = json.loads(args.baseline.read_text())
+        if baseline["parameters"] != PARAMETERS:
+            print("Baseline was recorded with different parameters; not comparing.")
+            baseline = None
+        elif baseline["environment"] != results["environment"]:
+            print("Baseline was recorded in a different environment: " \
+                + json.dumps(baseline["environment"]))
+
+    lines, regressions = compare_results(stages, baseline, args.tolerance, args.min_seconds)
+    print("\n".join(lines))
+    if regressions:
+        print(f"Slower than baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
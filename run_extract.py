@@ -1,4 +1,6 @@
 # Standard imports
+from collections import deque
+import json
 import logging
 from os import scandir
 from pathlib import Path
@@ -10,11 +12,17 @@ from mpi4py import MPI
 # Local imports
 from app.data.config import extract_config
 from app.Extract import Extract
+from app.Manifest import Manifest
+from app.Metrics import Metrics, summarize_metrics
+from app.ParallelOutput import ParallelOutput, is_parallel_available
+from app.Partition import estimate_costs, partition_basins
 
 '''Runs extract program using input and output directories specified
 in 'config.py' file.'''
 
 COMM = MPI.COMM_WORLD
+REQUEST_TAG = 1
+WORK_TAG = 2
 
 def run(input_dir, output_dir):
     """Run extract using MPI where a range of basins is handled by each process."""
@@ -26,60 +34,176 @@ def run(input_dir, output_dir):
     if rank == 0:
         main_logger.info(f"Extracting and calculating data for directory: {input_dir}")
     
-    # Create a dictionary of all ranks assigned to a range of basin directories
-    dir_dict = {}
-    if rank == 0:
-        dir_dict = get_dir_dict(input_dir, main_logger)
-      
-    # Send data dictionary to all processes to calculate SWOT and SWORD data
-    dir_dict = COMM.bcast(dir_dict, root=0)
+    extract = Extract([], output_dir, rank_logger)
+    extract.ranks_per_node = COMM.Split_type(MPI.COMM_TYPE_SHARED).Get_size()
+    start = time()
+    layout = extract_config["output_layout"]
+    if layout == "parallel":
+        extract.parallel_output, layout = create_parallel_output(input_dir, output_dir, 
+            rank_logger, main_logger)
+    extract.output_layout = layout
+    if extract_config["manifest_dir"] and layout != "parallel":
+        extract.manifest = Manifest(extract_config["manifest_dir"], rank, output_dir, layout)
+        # Every rank reads previous manifest files before any rank replaces its own
+        COMM.Barrier()
+    if extract_config["metrics_dir"]:
+        extract.metrics = Metrics(extract_config["metrics_dir"], rank)
+
+    if extract_config["scheduler"] == "dynamic" and COMM.Get_size() > 1:
+        # Rank 0 hands out basins on request from the remaining ranks
+        if rank == 0:
+            run_coordinator(input_dir, main_logger)
+        else:
+            run_worker(extract, extract_config["prefetch"])
+    else:
+        # Create a dictionary of all ranks assigned to a range of basin directories
+        dir_dict = {}
+        if rank == 0:
+            dir_dict = get_dir_dict(input_dir, main_logger)
+        
+        # Send data dictionary to all processes to calculate SWOT and SWORD data
+        dir_dict = COMM.bcast(dir_dict, root=0)
+
+        # Run extract on dir_dict passing input based on rank
+        extract.input_dir_list = dir_dict[rank]
+        extract.extract_data()
 
-    # Run extract on dir_dict passing input based on rank
-    extract = Extract(dir_dict[rank], output_dir, rank_logger)
-    extract.extract_data()
+    if extract.parallel_output is not None:
+        extract.parallel_output.close()
 
-    COMM.barrier()
+    # Gather completion statistics from each rank
+    records = extract.metrics.records if extract.metrics is not None else None
+    stats = COMM.gather((extract.basin_times, time() - start, records), root=0)
     if rank == 0:
+        log_rank_stats(stats, main_logger)
+        if extract.metrics is not None:
+            write_metrics_summary(stats, main_logger)
         main_logger.info(f"Processing complete.")
         main_logger.info(f"Reach files can be found in directory: {output_dir}")
 
+def create_parallel_output(input_dir, output_dir, rank_logger, main_logger):
+    """Returns a tuple of the shared output files for all ranks and the 
+    effective output layout.
+    
+    If parallel HDF5 is not available the files are None and the layout is
+    "basin", so each basin is written to its own files.
+    """
+
+    if not is_parallel_available(COMM):
+        if COMM.Get_rank() == 0:
+            main_logger.info("netCDF4 was built without parallel HDF5 support; " \
+                + "writing one file per basin instead.")
+        return None, "basin"
+    return ParallelOutput(COMM, input_dir, output_dir, rank_logger), "parallel"
+
+def run_coordinator(input_dir, main_logger):
+    """Hand out basin directories to worker ranks as they request work.
+
+    Basins are queued largest estimated cost first and each worker receives
+    None once the queue is empty.
+    """
+
+    with scandir(input_dir) as entries:
+        all_dir_list = [Path(entry.path) for entry in entries]
+    cost_dict = estimate_costs(all_dir_list, extract_config["partition_weights"])
+    queue = deque(sorted(cost_dict, key = lambda entry: (-cost_dict[entry], str(entry))))
+    main_logger.info(f"Total basins {len(queue)}")
+
+    active_workers = COMM.Get_size() - 1
+    status = MPI.Status()
+    while active_workers > 0:
+        COMM.recv(source=MPI.ANY_SOURCE, tag=REQUEST_TAG, status=status)
+        worker = status.Get_source()
+        entry = queue.popleft() if queue else None
+        COMM.send(entry, dest=worker, tag=WORK_TAG)
+        if entry is None:
+            active_workers -= 1
+        else:
+            main_logger.info(f"{worker},    assigned basin: {entry.name}")
+
+def run_worker(extract, prefetch):
+    """Request basin directories from the coordinator and extract them until
+    None is received.
+    
+    With prefetch the next basin is requested before the current basin is
+    processed so it is ready as soon as the current basin completes.
+    """
+
+    extract.start_workers()
+    try:
+        COMM.send(None, dest=0, tag=REQUEST_TAG)
+        entry = COMM.recv(source=0, tag=WORK_TAG)
+        while entry is not None:
+            if prefetch:
+                COMM.send(None, dest=0, tag=REQUEST_TAG)
+            extract.extract_basin(entry)
+            if not prefetch:
+                COMM.send(None, dest=0, tag=REQUEST_TAG)
+            entry = COMM.recv(source=0, tag=WORK_TAG)
+    finally:
+        extract.stop_workers()
+
+def log_rank_stats(stats, main_logger):
+    """Log basins processed, busy time and wall time for each rank."""
+
+    busy_list = []
+    for rank, (basin_times, wall_time, _) in enumerate(stats):
+        busy_time = sum(basin_times.values())
+        busy_list.append(busy_time)
+        main_logger.info(f"{rank},    basins processed: {len(basin_times)},    " \
+            + f"busy time: {busy_time:.1f} s,    wall time: {wall_time:.1f} s")
+
+    # Imbalance is measured over ranks that can process basins
+    worker_busy = busy_list[1:] if extract_config["scheduler"] == "dynamic" and len(busy_list) > 1 else busy_list
+    mean_busy = sum(worker_busy) / len(worker_busy)
+    if mean_busy > 0:
+        main_logger.info(f"Load imbalance (max / mean busy time): {max(worker_busy) / mean_busy:.3f}")
+
+def write_metrics_summary(stats, main_logger):
+    """Write a summary of the stage metrics gathered from every rank to 
+    summary.json in the metrics directory and log stage breakdowns and the
+    slowest basins."""
+
+    first_worker = 1 if extract_config["scheduler"] == "dynamic" and len(stats) > 1 else 0
+    summary = summarize_metrics([records for _, _, records in stats], 
+        [wall_time for _, wall_time, _ in stats], first_worker)
+    with open(Path(extract_config["metrics_dir"]) / "summary.json", "w") as json_file:
+        json.dump(summary, json_file, indent = 1)
+
+    for name, totals in sorted(summary["stages"].items(), key = lambda item: -item[1]["wall"]):
+        main_logger.info(f"Stage: {name},    wall time: {totals['wall']:.1f} s ({totals['share']:.1%}),    " \
+            + f"cpu time: {totals['cpu']:.1f} s,    read: {totals['read_mb_per_s']:.1f} MB/s,    " \
+            + f"written: {totals['write_mb_per_s']:.1f} MB/s,    imbalance: {totals['imbalance']:.3f}")
+    for basin in summary["slowest_basins"]:
+        stages = ", ".join(f"{name} {wall:.1f} s" for name, wall in basin["stages"].items())
+        main_logger.info(f"Slow basin: {basin['basin']},    rank: {basin['rank']},    " \
+            + f"wall time: {basin['wall']:.1f} s,    nodes: {basin['nodes']},    stages: {stages}")
+    main_logger.info(f"Throughput: {summary['nodes_per_s']:.1f} nodes/s")
+
 def get_dir_dict(input_dir, main_logger):
-    """Creates a dictionary of rank keys with a directory list value."""
+    """Creates a dictionary of rank keys with a directory list value.
+    
+    Directories are balanced across ranks by estimated basin cost."""
     
-    dir_dict = {}
     with scandir(input_dir) as entries:
         all_dir_list = [Path(entry.path) for entry in entries]
     
-    # Divide directory list up evenly and deal with any remainders
-    total_dirs = len(all_dir_list)
-    size = COMM.Get_size()
-    dirs_per_rank = total_dirs // size
-        
-    # Create a dictionary to send to each process with a key of rank
-    dir_count = 0
-    for i in range(size):
-        start = dir_count
-        end = dir_count + dirs_per_rank
-        dir_dict[i] = all_dir_list[start:end]
-        dir_count += dirs_per_rank
-
-    # Spread remaining directories over processes
-    if total_dirs % size != 0:
-        remaining = total_dirs - dir_count
-        i = 0
-        for j in range(remaining):
-            dir_dict[i].append(all_dir_list[dir_count])
-            dir_count += 1
-            i = 0 if i == (size - 1) else i + 1
+    # Estimate the cost of each basin and assign the largest basins first
+    cost_dict = estimate_costs(all_dir_list, extract_config["partition_weights"])
+    dir_dict, load_dict = partition_basins(cost_dict, COMM.Get_size())
 
     total_basins = 0
     for key,value in dir_dict.items():
-        basin_count = 0
-        for element in value:
-            basin_count += 1
+        basin_count = len(value)
         total_basins += basin_count
-        main_logger.info(f"{key},    basin count: {basin_count}")
+        main_logger.info(f"{key},    basin count: {basin_count},    predicted load: {load_dict[key]:.3f}")
+        main_logger.info(f"{key},    basins: {', '.join(entry.name for entry in value)}")
     main_logger.info(f"Total basins {total_basins}")
+    
+    # Log predicted imbalance as the ratio of maximum to mean rank load
+    mean_load = sum(load_dict.values()) / len(load_dict)
+    if mean_load > 0:
+        main_logger.info(f"Predicted load imbalance (max / mean): {max(load_dict.values()) / mean_load:.3f}")
 
     return dir_dict
 
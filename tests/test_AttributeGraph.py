@@ -0,0 +1,62 @@
+# Standard library imports
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import sleep
+import unittest
+from unittest.mock import Mock
+
+# Local imports
+from app.AttributeGraph import AttributeGraph
+
+class TestAttributeGraph(unittest.TestCase):
+    """Tests the methods in the AttributeGraph class."""
+
+    def test_evaluate(self):
+        wse = Mock(return_value = "wse")
+        width = Mock(return_value = "width")
+        slope = Mock(side_effect = lambda graph: graph["wse"] + "_slope")
+        graph = AttributeGraph({ "basin" : "008" }, { "wse" : wse, "width" : width, "slope" : slope })
+
+        # Assert dependencies are created once and unselected attributes never
+        graph.evaluate(["slope", "wse"])
+        self.assertEqual("wse_slope", graph["slope"])
+        wse.assert_called_once_with(graph)
+        width.assert_not_called()
+        self.assertIn("width", graph)
+        self.assertEqual(["basin", "wse", "slope", "width"], list(graph))
+        self.assertEqual(4, len(graph))
+
+    def test_evaluate_executor(self):
+        # Width and wse only finish once width, wse and slope have started
+        started = { name : Event() for name in ["width", "wse", "slope"] }
+        def read(name):
+            started[name].set()
+            if not all(event.wait(5) for event in started.values()): raise TimeoutError(name)
+            sleep(0.05)
+            return name
+        def slope(graph):
+            started["slope"].set()
+            return graph["wse"] + "_slope"
+        wse = Mock(side_effect = lambda graph: read("wse"))
+        builders = { "width" : lambda graph: read("width"), "wse" : wse, "slope" : slope,
+            "dxarea" : lambda graph: graph["width"] + graph["wse"] }
+        graph = AttributeGraph({}, builders)
+
+        # Assert slope waits for wse while it is created in another thread
+        with ThreadPoolExecutor(max_workers = 3) as executor:
+            graph.evaluate(["dxarea", "slope", "width", "wse"], executor)
+        self.assertEqual("wse_slope", graph["slope"])
+        self.assertEqual("widthwse", graph["dxarea"])
+        wse.assert_called_once()
+
+    def test_evaluate_error(self):
+        wse = Mock(side_effect = ValueError("stage"))
+        graph = AttributeGraph({}, { "wse" : wse, "slope" : lambda graph: graph["wse"] })
+
+        # Assert a failed attribute raises for dependent attributes
+        with ThreadPoolExecutor(max_workers = 2) as executor:
+            self.assertRaises(ValueError, graph.evaluate, ["slope", "wse"], executor)
+        self.assertRaises(ValueError, graph.__getitem__, "slope")
+
+if __name__ == '__main__':
+    unittest.main()
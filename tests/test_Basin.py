@@ -0,0 +1,62 @@
+# Standard library imports
+from pathlib import Path
+import tempfile
+import unittest
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.attributes.Basin import Basin, BasinArray
+from app.attributes.Topology import Topology
+
+class TestBasin(unittest.TestCase):
+    """Tests the methods in the Basin and BasinArray classes."""
+
+    TOPOLOGY = [
+        "index,lon,lat,link,dslink",
+        "30369,29.37,56.446,2,3",
+        "30370,29.36,56.446,1,2",
+        "30371,29.35,56.446,2,3",
+        "30372,29.34,56.446,10,2",
+        "30373,29.33,56.446,1,2"
+    ]
+
+    def setUp(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            topology_file = Path(temp_dir) / "008_T.csv"
+            topology_file.write_text("\n".join(self.TOPOLOGY) + "\n")
+            self.basin = Basin(Topology(topology_file), "008")
+
+    def test_basin(self):
+        # Assert reaches are sorted and nodes keep topology order within a reach
+        self.assertEqual(["008_1", "008_10", "008_2"], self.basin.keys)
+        np.testing.assert_array_equal([0, 2, 3, 5], self.basin.offsets)
+        np.testing.assert_array_equal(["30370", "30373", "30372", "30369", "30371"], 
+            self.basin.node_ids)
+        self.assertEqual(5, self.basin.num_nodes)
+        self.assertEqual(slice(3, 5), self.basin.slices["008_2"])
+
+        # Assert node mask is in sorted order
+        np.testing.assert_array_equal([False, True, False, True, False], 
+            self.basin.get_node_mask(["30373", "30369"]))
+
+    def test_create_array(self):
+        # Node data in topology file order
+        data = np.arange(10, dtype = float).reshape((5, 2))
+        basin_array = self.basin.create_array(data)
+
+        # Assert contiguous data sorted by reach
+        self.assertIsInstance(basin_array, BasinArray)
+        self.assertTrue(basin_array.data.flags.c_contiguous)
+        np.testing.assert_array_equal([[2, 3], [8, 9]], basin_array["008_1"])
+        np.testing.assert_array_equal([[6, 7]], basin_array["008_10"])
+        np.testing.assert_array_equal([[0, 1], [4, 5]], basin_array["008_2"])
+
+        # Assert dictionary behavior and zero-copy reach views
+        self.assertEqual(["008_1", "008_10", "008_2"], list(basin_array.keys()))
+        self.assertEqual(3, len(basin_array))
+        self.assertTrue(np.shares_memory(basin_array.data, basin_array["008_2"]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+# Standard library imports
+from pathlib import Path
+import json
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.Input import Input
+from app.attributes.Basin import Basin
+from app.attributes.Topology import Topology
+from app.attributes.Width import Width
+from app.attributes.Wse import Wse
+from benchmarks.generate_basins import generate_basins
+from benchmarks.run_benchmarks import compare_results
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests the synthetic basin generator and benchmark comparison."""
+
+    def test_generate_basins(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            input_dir, invalid_file = generate_basins(work_dir, num_basins = 1,
+                num_reaches = 3, min_nodes = 4, max_nodes = 6, num_time_steps = 600)
+            invalid_nodes = json.loads(invalid_file.read_text())
+
+            # Assert generated files are read by extract
+            window = { "start" : 500, "stop" : 600, "stride" : 1 }
+            with patch.dict('app.attributes.Utilities.extract_config', { "time_window" : window }), \
+                patch.dict('app.Input.extract_config', { "invalid_node_file" : str(invalid_file) }):
+                input = Input(Path(input_dir) / "001")
+                topology = Topology(input.topology_file)
+                basin = Basin(topology, "001")
+                wse = Wse(input.wse_file, basin, input.invalid_nodes)
+                width = Width(input.width_file, basin, input.invalid_nodes)
+
+        self.assertEqual(["001"], list(invalid_nodes))
+        self.assertEqual(3, len(basin.keys))
+        self.assertEqual(100, wse.wse_node.data.shape[1])
+        self.assertTrue(np.isfinite(np.nanmax(wse.wse_node.data)))
+        self.assertEqual(3, len(width.width_reach))
+
+    def test_compare_results(self):
+        baseline = { "stages" : { "wse" : { "min" : 1.0 }, "slope" : { "min" : 0.01 } } }
+        stages = { "wse" : { "min" : 1.5, "median" : 1.6 }, "slope" : { "min" : 0.02, "median" : 0.02 },
+            "output" : { "min" : 2.0, "median" : 2.0 } }
+
+        # Assert only stages slower by tolerance and min_seconds are flagged
+        lines, regressions = compare_results(stages, baseline, 0.25, 0.05)
+        self.assertEqual(["wse"], regressions)
+        self.assertEqual(4, len(lines))
+        self.assertEqual([], compare_results(stages, baseline, 0.6, 0.05)[1])
+        self.assertEqual([], compare_results(stages, None, 0.25, 0.05)[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,29 +1,96 @@
 # Standard library imports
+from pathlib import Path
+import tempfile
 import unittest
+from unittest.mock import patch
 
 # Third party imports
 import numpy as np
 import pandas as pd
 
 # Local imports
-from app.attributes.Discharge import _calculate_qhat_qsd
+from app.attributes.Basin import Basin, BasinArray
+from app.attributes.Discharge import _calculate_qhat_qsd, _create_sword_data, \
+    _iter_array_blocks, _merge_moments, _stream_moments
+from app.attributes.Topology import Topology
+from app.attributes.Utilities import iter_node_data_txt, read_node_data_txt
 
 class TestDischarge(unittest.TestCase):
     """Tests the methods in the Discharge class."""
 
-    def test__calculate_qhat_qsd(self):
+    @patch('app.attributes.Basin', autospec=True)
+    def test__calculate_qhat_qsd(self, mock_basin):
         # Create example discharge data for a key of 1
-        data_dict = {}
-        data_dict["1"] = pd.DataFrame(np.reshape(np.arange(0, 25, dtype=float), (5, 5)))
-        data_dict["1"][0][0] = np.nan
-        data_dict["1"][3][1] = np.nan
-        data_dict["1"][4][1] = np.nan
-        data_dict["1"][2][2] = np.nan
-        hat_sd_dict = _calculate_qhat_qsd(data_dict)
+        data = pd.DataFrame(np.reshape(np.arange(0, 25, dtype=float), (5, 5)))
+        data[0][0] = np.nan
+        data[3][1] = np.nan
+        data[4][1] = np.nan
+        data[2][2] = np.nan
+
+        # Add a second reach with no valid values
+        mock_basin.keys = ["1", "2"]
+        mock_basin.offsets = np.array([0, 5, 7])
+        data = np.concatenate([data.to_numpy(), np.full((2, 5), np.nan)])
+        hat_sd_dict = _calculate_qhat_qsd(BasinArray(data, mock_basin))
         
         # Assert hat and sd values
         self.assertAlmostEqual(12.90476190, hat_sd_dict["qhat_reach"]["1"])
         self.assertAlmostEqual(7.282756947, hat_sd_dict["qsd_reach"]["1"])
+        self.assertTrue(np.isnan(hat_sd_dict["qhat_reach"]["2"]))
+        self.assertTrue(np.isnan(hat_sd_dict["qsd_reach"]["2"]))
+
+    def test_merge_moments(self):
+        # Moments of [1, 2, 4] and [] for two reaches
+        moments_a = (np.array([3, 0]), np.array([7 / 3, 0.0]), np.array([14 / 3, 0.0]))
+        
+        # Moments of [8, 16] and [3] for two reaches
+        moments_b = (np.array([2, 1]), np.array([12.0, 3.0]), np.array([32.0, 0.0]))
+        count, mean, m2 = _merge_moments(moments_a, moments_b)
+
+        # Assert merged moments match moments of [1, 2, 4, 8, 16] and [3]
+        np.testing.assert_array_equal([5, 1], count)
+        np.testing.assert_allclose([6.2, 3.0], mean)
+        np.testing.assert_allclose([148.8, 0.0], m2)
+
+    def test_stream_moments(self):
+        # Discharge file with 3 nodes in 2 reaches and 1000 time steps
+        rng = np.random.default_rng(0)
+        q = rng.uniform(10, 500, (1000, 3))
+        q[600, 1] = np.nan
+        with tempfile.TemporaryDirectory() as temp_dir:
+            topology_file = Path(temp_dir) / "001_T.csv"
+            topology_file.write_text("index,lon,lat,link,dslink\n1,0,0,2,0\n2,0,0,1,0\n3,0,0,2,0\n")
+            basin = Basin(Topology(topology_file), "001")
+            discharge_file = Path(temp_dir) / "001.discharge"
+            with open(discharge_file, "w") as f:
+                f.write("Time; nodes\n")
+                for t in range(q.shape[0]):
+                    f.write(f"{t + 1} " + " ".join(str(value) for value in q[t]) + "\n")
+
+            # Stream time steps after 500 with a block size that does not divide them
+            invalid_mask = basin.get_node_mask(["3"])
+            blocks = iter_node_data_txt(discharge_file, basin.num_nodes, "Time;", 64, 
+                rows = slice(500, 9862))
+            moments = _stream_moments(blocks, basin, invalid_mask)
+
+            # Assert strided time steps are parsed without the skipped rows
+            _, strided = read_node_data_txt(discharge_file, basin.num_nodes, phrase = "Time;",
+                block_rows = 16, rows = slice(500, 1000, 7))
+            np.testing.assert_array_equal(q[500::7].T, strided)
+        sword_data = _create_sword_data(moments, basin.keys)
+
+        # Assert blocks of a parsed array give the same moments
+        array_moments = _stream_moments(_iter_array_blocks(q[500:].T, 100), basin, invalid_mask)
+        for expected, actual in zip(moments, array_moments):
+            np.testing.assert_allclose(expected, actual)
+
+        # Assert moments match the time steps after 500 of the valid nodes
+        reach_1 = q[500:, 1]
+        reach_2 = q[500:, 0]
+        self.assertAlmostEqual(np.nanmean(reach_1), sword_data["qhat_reach"]["001_1"])
+        self.assertAlmostEqual(np.nanstd(reach_1), sword_data["qsd_reach"]["001_1"])
+        self.assertAlmostEqual(np.mean(reach_2), sword_data["qhat_reach"]["001_2"])
+        self.assertAlmostEqual(np.std(reach_2), sword_data["qsd_reach"]["001_2"])
 
 if __name__ == '__main__':
     unittest.main()
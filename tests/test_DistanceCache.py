@@ -0,0 +1,81 @@
+# Standard library imports
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.DistanceCache import DistanceCache
+
+class TestDistanceCache(unittest.TestCase):
+    """Tests the methods in the DistanceCache class."""
+
+    DISTANCES = np.array([0.0, 616.7233638731635, 1233.4467244843192])
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.topology_file = self.root / "008_T.csv"
+        self.topology_file.write_text("index,lon,lat,link,dslink\n30369,29.37,56.446,1,2\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_save_load(self):
+        cache = DistanceCache(self.root / "cache", 1000000, 10)
+        cache_file = cache.get_path("008", self.topology_file)
+
+        # Assert missing cache file then round trip
+        self.assertIsNone(cache.load(cache_file, 3))
+        cache.save(cache_file, self.DISTANCES)
+        np.testing.assert_array_equal(self.DISTANCES, cache.load(cache_file, 3))
+
+        # Assert mismatched number of nodes is treated as a miss
+        self.assertIsNone(cache.load(cache_file, 4))
+
+    def test_load_evicted(self):
+        cache = DistanceCache(self.root / "cache", 1000000, 10)
+        cache_file = cache.get_path("008", self.topology_file)
+        cache.save(cache_file, self.DISTANCES)
+
+        # Assert distances are returned when another rank evicts the file after it is read
+        with patch('app.DistanceCache.os.utime', side_effect = FileNotFoundError):
+            np.testing.assert_array_equal(self.DISTANCES, cache.load(cache_file, 3))
+
+    def test_load_stale(self):
+        cache = DistanceCache(self.root / "cache", 1000000, 10)
+        stale_file = cache.get_path("008", self.topology_file)
+        cache.save(stale_file, self.DISTANCES)
+
+        # Change topology content; assert new key and stale file removal
+        self.topology_file.write_text("index,lon,lat,link,dslink\n30370,29.36,56.446,1,2\n")
+        cache_file = cache.get_path("008", self.topology_file)
+        self.assertNotEqual(stale_file, cache_file)
+        self.assertIsNone(cache.load(cache_file, 3))
+        self.assertFalse(stale_file.exists())
+
+    def test_evict(self):
+        cache = DistanceCache(self.root / "cache", 1000000, 2)
+        files = [cache.cache_dir / f"{basin}_{'0' * 16}.npy" for basin in ["001", "002", "003"]]
+        for i, cache_file in enumerate(files):
+            cache.save(cache_file, self.DISTANCES)
+            os.utime(cache_file, (i, i))
+
+        # Assert least recently used file is evicted over the file limit
+        cache.save(files[2], self.DISTANCES)
+        self.assertFalse(files[0].exists())
+        self.assertTrue(files[1].exists())
+        self.assertTrue(files[2].exists())
+
+        # Assert size limit
+        cache.max_bytes = files[2].stat().st_size
+        cache.save(files[2], self.DISTANCES)
+        self.assertFalse(files[1].exists())
+        self.assertTrue(files[2].exists())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,14 +1,17 @@
 # Standard library imports
+from pathlib import Path
+import tempfile
 import unittest
 from unittest.mock import patch
 
 # Third party imports
 import numpy as np
 import pandas as pd
-from pandas._testing import assert_frame_equal, assert_series_equal
+from pandas._testing import assert_series_equal
 
 # Local imports
-from app.attributes.Dxarea import _calculate_dxa, Dxarea
+from app.attributes.Basin import BasinArray
+from app.attributes.Dxarea import _calculate_dxa_node, _calculate_dxa_reach, Dxarea
 from app.attributes.Topology import Topology
 from app.attributes.Width import Width
 from app.attributes.Wse import Wse
@@ -16,78 +19,100 @@ from app.attributes.Wse import Wse
 class TestDxarea(unittest.TestCase):
     """Tests the methods in the Dxarea class."""
 
-    TOPOLOGY = Topology("tests/test_data/008_T.csv")
+    TOPOLOGY = [
+        "index,lon,lat,link,dslink",
+        "30369,29.37,56.446,1,2",
+        "30370,29.36,56.446,1,2",
+        "30371,29.35,56.446,1,2"
+    ]
 
-    def test_calculate_dxa_node(self):
-        # Create width data
-        width = pd.DataFrame(np.full((3, 5), 30.0), dtype=float)
-        
-        # Create wse data
-        wse_list = [33.5, 30, 28.75, 25, 24.3, 23.8, 22, 20, 18.6, 17, 15.85, 13.12, 10, 8.6, 5.43]
-        wse = pd.DataFrame(np.array(wse_list).reshape((3,5)), dtype=float)
+    WSE_LIST = [33.5, 30, 28.75, 25, 24.3, 23.8, 22, 20, 18.6, 17, 15.85, 13.12, 10, 8.6, 5.43]
+    EXPECTED_NODE = [291, 240, 262.5, 192, 219, 0, 0, 0, 0, 0, -238.5, -266.4, -300, -300, -347.1]
+
+    def setUp(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            topology_file = Path(temp_dir) / "008_T.csv"
+            topology_file.write_text("\n".join(self.TOPOLOGY) + "\n")
+            self.topology = Topology(topology_file)
+
+    @patch('app.attributes.Basin', autospec=True)
+    def test_calculate_dxa_node(self, mock_basin):
+        # Two reaches; the second reach has the first reach's wse plus 1 m and a NaN
+        mock_basin.offsets = np.array([0, 3, 6])
+        wse = np.array(self.WSE_LIST).reshape((3,5))
+        wse = np.concatenate([wse, wse + 1.0])
+        wse[4, 0] = np.nan
+        width = np.full((6, 5), 30.0)
 
         # Expected dxa
-        expected_dxa = np.array([291, 240, 262.5, 192, 219, 0, 0, 0, 0, 0, -238.5, -266.4, -300, -300, -347.1]).reshape((3,5))
-        expected_dxa = pd.DataFrame(expected_dxa)
+        expected_dxa = np.array(self.EXPECTED_NODE).reshape((3,5))
+        expected_dxa = np.concatenate([expected_dxa, expected_dxa])
+        expected_dxa[3, 0] = 30.0 * (33.5 - (33.5 + 15.85) / 2)
+        expected_dxa[4, 0] = np.nan
+        expected_dxa[5, 0] = 30.0 * (15.85 - (33.5 + 15.85) / 2)
         
         # Assert result of function
-        actual_dxa = _calculate_dxa(wse, width)
-        assert_frame_equal(expected_dxa, actual_dxa)
+        actual_dxa = _calculate_dxa_node(BasinArray(wse, mock_basin), BasinArray(width, mock_basin))
+        np.testing.assert_allclose(expected_dxa, actual_dxa.data)
 
     def test_calculate_dxa_reach(self):
         # Create width data
-        width = pd.Series(np.full((5), 30.0), dtype=float)
+        width = np.full((2, 5), 30.0)
         
-        # Create wse data
-        wse = pd.Series(np.array([24.38333, 21.70666, 19.58333, 17.4, 15.57666]), dtype=float)
+        # Create wse data; second reach has no valid values
+        wse = np.array([[24.38333, 21.70666, 19.58333, 17.4, 15.57666], np.full(5, np.nan)])
 
         # Expected dxa
-        expected_dxa = pd.Series(np.array([144, 63.6999, 0, -65.4999, -120.2001]), dtype=float)
+        expected_dxa = np.array([[144, 63.6999, 0, -65.4999, -120.2001], np.full(5, np.nan)])
 
         # Assert result of function
-        actual_dxa = _calculate_dxa(wse, width)
-        assert_series_equal(expected_dxa, actual_dxa)
+        actual_dxa = _calculate_dxa_reach(wse, width)
+        np.testing.assert_allclose(expected_dxa, actual_dxa)
 
+    @patch('app.attributes.Basin', autospec=True)
     @patch('app.attributes.Width', autospec=True)
     @patch('app.attributes.Wse', autospec=True)
-    def test_create_dxa_node_dict(self, mock_wse, mock_width):
+    def test_create_dxa_node_dict(self, mock_wse, mock_width, mock_basin):
+        # Create basin with a single reach
+        mock_basin.keys = ["1"]
+        mock_basin.offsets = np.array([0, 3])
+        mock_basin.slices = { "1" : slice(0, 3) }
+
         # Create width data
-        width_node_dict = {}
-        width_node_dict["1"] = pd.DataFrame(np.full((3, 5), 30.0), dtype=float)
-        mock_width.width_node = width_node_dict
+        mock_width.width_node = BasinArray(np.full((3, 5), 30.0), mock_basin)
         mock_width.width_reach = {}
 
         # Create wse data
-        wse_list = [33.5, 30, 28.75, 25, 24.3, 23.8, 22, 20, 18.6, 17, 15.85, 13.12, 10, 8.6, 5.43]
-        wse_dict = {}
-        wse_dict["1"] = pd.DataFrame(np.array(wse_list).reshape((3,5)), dtype=float)
-        mock_wse.wse_node = wse_dict
+        mock_wse.wse_node = BasinArray(np.array(self.WSE_LIST).reshape((3,5)), mock_basin)
         mock_wse.wse_reach = {}
 
         # Assert results of node dictionary creation
-        dxa = Dxarea(mock_width, mock_wse, self.TOPOLOGY)
-        expected_node = np.array([291, 240, 262.5, 192, 219, 0, 0, 0, 0, 0, -238.5, -266.4, -300, -300, -347.1]).reshape((3,5))
-        expected_dict = {}
-        expected_dict["1"] = pd.DataFrame(expected_node)
-        assert_frame_equal(expected_dict["1"], dxa.dxarea_node["1"])
+        dxa = Dxarea(mock_width, mock_wse, self.topology)
+        expected_node = np.array(self.EXPECTED_NODE).reshape((3,5))
+        np.testing.assert_allclose(expected_node, dxa.dxarea_node["1"])
     
+    @patch('app.attributes.Basin', autospec=True)
     @patch('app.attributes.Width', autospec=True)
     @patch('app.attributes.Wse', autospec=True)
-    def test_create_dxa_reach_dict(self, mock_wse, mock_width):
+    def test_create_dxa_reach_dict(self, mock_wse, mock_width, mock_basin):
+        # Create empty node data
+        mock_basin.keys = []
+        mock_basin.offsets = np.array([0])
+        mock_width.width_node = BasinArray(np.zeros((0, 5)), mock_basin)
+        mock_wse.wse_node = BasinArray(np.zeros((0, 5)), mock_basin)
+
         # Create width data
         width_reach_dict = {}
         width_reach_dict["1"] = pd.Series(np.full((5), 30.0), dtype=float)
         mock_width.width_reach = width_reach_dict
-        mock_width.width_node = {}
 
         # Create wse data
         wse_reach_dict = {}
         wse_reach_dict["1"] = pd.Series(np.array([24.38333, 21.70666, 19.58333, 17.4, 15.57666]), dtype=float)
         mock_wse.wse_reach = wse_reach_dict
-        mock_wse.wse_node = {}
 
         # Assert results of reach dictionary creation
-        dxa = Dxarea(mock_width, mock_wse, self.TOPOLOGY)
+        dxa = Dxarea(mock_width, mock_wse, self.topology)
         expected_dict = {}
         expected_dict["1"] = pd.Series(np.array([144, 63.6999, 0, -65.4999, -120.2001]), dtype=float)
         assert_series_equal(expected_dict["1"], dxa.dxarea_reach["1"])
@@ -0,0 +1,103 @@
+# Standard library imports
+from pathlib import Path
+import unittest
+from unittest.mock import patch, Mock
+
+# Local imports
+from app.AttributeGraph import AttributeGraph
+from app.Extract import Extract
+
+class TestExtract(unittest.TestCase):
+    """Tests the methods in the Extract class."""
+
+    DIR_LIST = [Path("008"), Path("009"), Path("010")]
+
+    @patch('app.Extract.extract_config', { "load_threads" : 0, "write_queue_depth" : 1 })
+    @patch('app.Extract.get_pool_size', Mock(return_value = 1))
+    @patch('app.Extract.set_kernel_threads', Mock())
+    @patch('app.Extract._create_data_dict')
+    @patch('app.Extract.Input')
+    @patch('app.Extract.Output')
+    def test_extract_data_writer(self, mock_output, mock_input, mock_data):
+
+        # Record the basin of each write
+        written = []
+        builders = { name : Mock() for name in ["discharge", "dxarea", "slope", "width", "wse"] }
+        mock_data.side_effect = lambda input, basin_num, slope_pool, basin_metrics: \
+            AttributeGraph({ "basin_num" : basin_num }, builders)
+        mock_output.side_effect = lambda data, directory, logger, layout: \
+            Mock(write_output = lambda keys: written.append(data["basin_num"]) or [])
+
+        # Execute function; assert every basin is written in order
+        extract = Extract(self.DIR_LIST, Path("out"), Mock())
+        extract.extract_data()
+        self.assertEqual(["008", "009", "010"], written)
+        self.assertEqual(["008", "009", "010"], sorted(extract.basin_times))
+        self.assertIsNone(extract.writer)
+
+    @patch('app.Extract.extract_config', { "input_cache_dir" : "", "write_queue_depth" : 0 })
+    @patch('app.Extract.Basin')
+    @patch('app.Extract.Topology')
+    @patch('app.Extract.Wse')
+    @patch('app.Extract.Discharge')
+    @patch('app.Extract.Input')
+    @patch('app.Extract.Output')
+    def test_extract_basin_metrics(self, mock_output, mock_input, mock_discharge, mock_wse, 
+        mock_topology, mock_basin):
+
+        # Basin of two reaches that only writes discharge products
+        mock_basin.return_value = Mock(num_nodes = 7, keys = ["008_1", "008_2"])
+        mock_output.return_value.write_output.return_value = []
+        extract = Extract([], Path("out"), Mock())
+        extract.metrics = Mock()
+
+        # Assert metrics of every stage are recorded with the basin time
+        with patch('app.Extract.get_products', return_value = ([], ["Qhat"])):
+            extract.extract_basin(Path("008"))
+        basin_metrics, wall = extract.metrics.record.call_args.args
+        self.assertEqual(["input", "topology", "discharge", "write"], list(basin_metrics.stages))
+        self.assertEqual((7, 2, False), (basin_metrics.nodes, basin_metrics.reaches, basin_metrics.skipped))
+        self.assertEqual(extract.basin_times["008"], wall)
+        mock_wse.assert_not_called()
+
+    @patch('app.Extract.extract_config', { "load_threads" : 0, "write_queue_depth" : 1 })
+    @patch('app.Extract.get_pool_size', Mock(return_value = 1))
+    @patch('app.Extract.set_kernel_threads', Mock())
+    @patch('app.Extract._create_data_dict')
+    @patch('app.Extract.Input')
+    @patch('app.Extract.Output')
+    def test_extract_data_writer_error(self, mock_output, mock_input, mock_data):
+
+        # Fail the first write
+        mock_output.return_value.write_output.side_effect = [OSError("disk full"), [], []]
+
+        # Execute function; assert writer exception is raised in calling thread
+        extract = Extract(self.DIR_LIST, Path("out"), Mock())
+        self.assertRaises(OSError, extract.extract_data)
+        self.assertIsNone(extract.writer)
+        self.assertNotIn("008", extract.basin_times)
+
+    @patch('app.Extract.extract_config', { "write_queue_depth" : 0 })
+    @patch('app.Extract._create_data_dict')
+    @patch('app.Extract.Input')
+    @patch('app.Extract.Output')
+    def test_extract_basin_manifest(self, mock_output, mock_input, mock_data):
+
+        # First basin is complete and second basin is missing a reach file
+        extract = Extract([], Path("out"), Mock())
+        extract.manifest = Mock()
+        extract.manifest.get_redo_files.side_effect = [[], ["009_2_SOS.nc"]]
+        mock_output.return_value.write_output.return_value = []
+
+        # Assert complete basin is skipped and recorded
+        extract.extract_basin(Path("008"))
+        mock_data.assert_not_called()
+        extract.manifest.record.assert_called_once()
+
+        # Assert only the missing reach is written
+        extract.extract_basin(Path("009"))
+        mock_output.return_value.write_output.assert_called_once_with({ "009_2" })
+        self.assertEqual(2, extract.manifest.record.call_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+# Standard library imports
+import os
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.InputCache import InputCache
+
+class TestInputCache(unittest.TestCase):
+    """Tests the methods in the InputCache class."""
+
+    NODE = np.arange(12, dtype = np.float64).reshape((3, 4))
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.source = self.root / "008.stage"
+        self.source.write_text("Stage information\n")
+        self.parse = Mock(return_value = { "base" : None, "node" : self.NODE })
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_read(self):
+        # Assert parse on a miss and memory map on a hit from a later run
+        InputCache(self.root / "cache", "008").read("stage", [self.source], self.parse)
+        arrays = InputCache(self.root / "cache", "008").read("stage", [self.source], self.parse)
+        self.parse.assert_called_once()
+        self.assertEqual(["node"], list(arrays))
+        self.assertIsInstance(arrays["node"], np.memmap)
+        np.testing.assert_array_equal(self.NODE, arrays["node"])
+
+        # Assert cached arrays are copy-on-write
+        arrays["node"][0, 0] = np.nan
+        arrays = InputCache(self.root / "cache", "008").read("stage", [self.source], self.parse)
+        self.assertEqual(0.0, arrays["node"][0, 0])
+
+    def test_load_changed(self):
+        cache = InputCache(self.root / "cache", "008")
+        cache.save("stage", [self.source], { "node" : self.NODE })
+
+        # Assert a new modification time with the same contents is a hit
+        os.utime(self.source, (0, 0))
+        self.assertIsNotNone(InputCache(self.root / "cache", "008").load("stage", [self.source]))
+        self.assertEqual(0, InputCache(self.root / "cache", "008").metadata["stage"] \
+            ["sources"]["008.stage"]["mtime_ns"])
+
+        # Assert changed contents and changed sources are misses
+        self.source.write_text("Stage information!\n")
+        self.assertIsNone(cache.load("stage", [self.source]))
+        self.source.write_text("Stage informatioN\n")
+        self.assertIsNone(cache.load("stage", [self.source]))
+        self.assertIsNone(cache.load("stage", [self.source, self.root / "008_W.dbf"]))
+        self.assertIsNone(cache.load("discharge", [self.source]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# Standard library imports
+import os
+from pathlib import Path
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, Mock
+
+# Local imports
+from app.Manifest import Manifest
+
+class TestManifest(unittest.TestCase):
+    """Tests the methods in the Manifest class."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.input_dir = self.root / "008"
+        self.input_dir.mkdir()
+        (self.input_dir / "008_T.csv").write_text("index,lon,lat,link,dslink\n")
+        (self.input_dir / "008.stage").write_text("Stage information\n")
+        self.output_dir = self.root / "output"
+        self.output_dir.mkdir()
+        self.output_files = [self.output_dir / "008_1_SWOT.nc", self.output_dir / "008_1_SOS.nc"]
+        for output_file in self.output_files:
+            output_file.write_bytes(b"0" * 100)
+        self.input = Mock(input_directory = self.input_dir, basin_num = "008",
+            invalid_nodes = { "008" : [30369] })
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    @patch('app.Manifest.extract_config', { "output_encoding" : {}, "output_layout" : "reach", "products" : ["wse"] })
+    def test_hash_inputs(self):
+        inputs = Manifest(self.root / "manifest", 0, self.output_dir).hash_inputs(self.input)
+
+        # Assert missing input files and changes to the invalid node list
+        self.assertIsNone(inputs["files"]["008.discharge"])
+        self.assertEqual(64, len(inputs["files"]["008.stage"]))
+        self.input.invalid_nodes = { "008" : [30370] }
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        self.assertNotEqual(inputs["invalid_nodes"], manifest.hash_inputs(self.input)["invalid_nodes"])
+
+        # Assert the effective layout is recorded instead of the config
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir, "basin")
+        self.assertEqual("basin", manifest.hash_inputs(self.input)["output_layout"])
+
+        # Assert changes to the output encoding
+        with patch.dict('app.Manifest.extract_config', { "output_encoding" : { "wse" : { "dtype" : "f4" } } }):
+            self.assertNotEqual(inputs["output_encoding"], manifest.hash_inputs(self.input)["output_encoding"])
+
+        # Assert the time window is recorded with its default stride
+        self.assertEqual({ "start" : 500, "stop" : 9862, "stride" : 1 }, inputs["time_window"])
+        window = { "start" : 500, "stop" : 600 }
+        with patch.dict('app.attributes.Utilities.extract_config', { "time_window" : window }):
+            self.assertEqual({ "start" : 500, "stop" : 600, "stride" : 1 },
+                manifest.hash_inputs(self.input)["time_window"])
+
+    @patch('app.Manifest.extract_config', { "output_encoding" : {}, "output_layout" : "reach", "products" : ["wse"] })
+    def test_get_redo_files(self):
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        inputs = manifest.hash_inputs(self.input)
+        self.assertIsNone(manifest.get_redo_files("008", inputs))
+        manifest.record("008", inputs, self.output_files)
+
+        # Assert complete basin in a later run from another rank
+        manifest = Manifest(self.root / "manifest", 1, self.output_dir)
+        self.assertEqual([], manifest.get_redo_files("008", inputs))
+
+        # Assert missing and truncated output files
+        self.output_files[0].write_bytes(b"0" * 50)
+        self.output_files[1].unlink()
+        self.assertEqual(["008_1_SOS.nc", "008_1_SWOT.nc"],
+            sorted(manifest.get_redo_files("008", inputs)))
+
+        # Assert changed input file
+        (self.input_dir / "008.stage").write_text("Stage information\n1\n")
+        self.assertIsNone(manifest.get_redo_files("008", manifest.hash_inputs(self.input)))
+
+    @patch('app.Manifest.extract_config', { "output_encoding" : {}, "output_layout" : "reach", "products" : ["wse"] })
+    def test_record(self):
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        inputs = manifest.hash_inputs(self.input)
+        manifest.record("008", inputs, self.output_files)
+
+        # Assert rewriting one file keeps previously recorded files
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        self.output_files[0].write_bytes(b"0" * 200)
+        manifest.record("008", inputs, self.output_files[:1])
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        self.assertEqual({ "008_1_SOS.nc" : 100, "008_1_SWOT.nc" : 200 },
+            manifest.previous["008"]["outputs"])
+        self.assertEqual([], manifest.get_redo_files("008", inputs))
+
+    @patch('app.Manifest.extract_config', { "output_encoding" : {}, "output_layout" : "reach", "products" : ["wse"] })
+    def test_record_keeps_previous(self):
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        inputs = manifest.hash_inputs(self.input)
+        manifest.record("008", inputs, self.output_files)
+
+        # Assert a rerun that records another basin keeps the earlier entry
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        manifest.record("009", inputs, self.output_files[:1])
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        self.assertEqual(["008", "009"], sorted(manifest.previous))
+        self.assertEqual([], manifest.get_redo_files("008", inputs))
+
+    @patch('app.Manifest.extract_config', { "output_encoding" : {}, "output_layout" : "reach", "products" : ["wse"] })
+    def test_record_newest_entry(self):
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        old_inputs = manifest.hash_inputs(self.input)
+        manifest.record("008", old_inputs, self.output_files)
+
+        # Rank 0 recomputes the basin with changed inputs while rank 1, 
+        # holding the stale entry, saves its file afterwards
+        (self.input_dir / "008.stage").write_text("Stage information\n1\n")
+        rank_0 = Manifest(self.root / "manifest", 0, self.output_dir)
+        rank_1 = Manifest(self.root / "manifest", 1, self.output_dir)
+        inputs = rank_0.hash_inputs(self.input)
+        rank_0.record("008", inputs, self.output_files)
+        rank_1.record("009", old_inputs, self.output_files[:1])
+        os.utime(rank_1.manifest_file, (time.time() + 10, time.time() + 10))
+
+        # Assert the recomputed entry is used in the next run
+        manifest = Manifest(self.root / "manifest", 0, self.output_dir)
+        self.assertEqual([], manifest.get_redo_files("008", inputs))
+
+if __name__ == '__main__':
+    unittest.main()
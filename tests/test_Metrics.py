@@ -0,0 +1,73 @@
+# Standard library imports
+import json
+from pathlib import Path
+import tempfile
+import unittest
+
+# Local imports
+from app.Metrics import BasinMetrics, get_file_bytes, Metrics, summarize_metrics
+
+class TestMetrics(unittest.TestCase):
+    """Tests the methods in the Metrics module."""
+
+    def create_record(self, rank, basin_num, wall, stages, skipped = False):
+        stages = { name : { "wall" : value, "cpu" : value / 2, "bytes_read" : 1e6, "bytes_written" : 0 }
+            for name, value in stages.items() }
+        return { "rank" : rank, "basin" : basin_num, "skipped" : skipped, "nodes" : 10,
+            "reaches" : 2, "stages" : stages, "wall" : wall }
+
+    def test_record(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = Path(temp_dir) / "008.stage"
+            input_file.write_bytes(b"0" * 100)
+
+            # Measure two stages of one basin
+            basin_metrics = BasinMetrics("008")
+            self.assertEqual(7, basin_metrics.call("wse", [input_file, Path(temp_dir) / "missing"], max, 3, 7))
+            with basin_metrics.measure("write") as stage:
+                stage["bytes_written"] = 50
+
+            # Assert one JSON line is appended for each basin
+            metrics = Metrics(Path(temp_dir) / "metrics", 2)
+            metrics.record(basin_metrics, 1.5)
+            metrics.record(BasinMetrics("009"), 0.5)
+            lines = metrics.metrics_file.read_text().splitlines()
+
+        self.assertEqual(2, len(lines))
+        record = json.loads(lines[0])
+        self.assertEqual((2, "008", 1.5), (record["rank"], record["basin"], record["wall"]))
+        self.assertEqual(100, record["stages"]["wse"]["bytes_read"])
+        self.assertEqual(50, record["stages"]["write"]["bytes_written"])
+        self.assertEqual(record, metrics.records[0])
+
+    def test_get_file_bytes(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            files = [Path(temp_dir) / "a", Path(temp_dir) / "b"]
+            files[0].write_bytes(b"0" * 10)
+            self.assertEqual(10, get_file_bytes(files + [None]))
+
+    def test_summarize_metrics(self):
+        # Rank 0 is a coordinator and rank 2 is twice as busy as rank 1
+        rank_records = [[],
+            [self.create_record(1, "008", 2.0, { "wse" : 1.5, "write" : 0.5 }),
+                self.create_record(1, "010", 0.0, { "input" : 0.0 }, skipped = True)],
+            [self.create_record(2, "009", 4.0, { "wse" : 1.0, "write" : 3.0 })]]
+        summary = summarize_metrics(rank_records, [6.0, 6.0, 6.0], first_worker = 1, slowest = 1)
+
+        # Assert imbalance excludes rank 0 and skipped basins
+        self.assertEqual(2, summary["basins"])
+        self.assertAlmostEqual(4.0 / 3.0, summary["load_imbalance"])
+        self.assertEqual([0, 1, 1], [rank["basins"] for rank in summary["ranks"]])
+        self.assertEqual(1, summary["ranks"][1]["skipped"])
+        self.assertAlmostEqual(20 / 6.0, summary["nodes_per_s"])
+
+        # Assert stage breakdown and slowest basin
+        self.assertAlmostEqual(3.5, summary["stages"]["write"]["wall"])
+        self.assertAlmostEqual(3.5 / 6.0, summary["stages"]["write"]["share"])
+        self.assertAlmostEqual(2 / 2.5, summary["stages"]["wse"]["read_mb_per_s"])
+        self.assertAlmostEqual(3.0 / 1.75, summary["stages"]["write"]["imbalance"])
+        self.assertEqual(["009"], [basin["basin"] for basin in summary["slowest_basins"]])
+        self.assertEqual({ "wse" : 1.0, "write" : 3.0 }, summary["slowest_basins"][0]["stages"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# Standard library imports
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Third party imports
+import numpy as np
+import pandas as pd
+
+# Local imports
+from app.attributes.Basin import BasinArray
+from app.attributes.Utilities import create_mean_series, read_node_data_txt, reduce_reaches
+
+class TestNodeData(unittest.TestCase):
+    """Tests the Utilities functions that read and reduce node data on small
+    temporary files so they run without the test dataset."""
+
+    def test_read_node_data_txt(self):
+        # Create a small stage file with base and time series sections
+        text = "Header\nStage information\n" \
+            + "1 29.37 56.44 171.78\n2 29.36 56.44 167.94\n" \
+            + "Other section\nTime; node values\n" \
+            + "1.0 0.5 1.5\n2.0 0.0 2.5\n3.0 1.25 3.5\n\n"
+        with tempfile.TemporaryDirectory() as temp_dir:
+            stage_file = Path(temp_dir) / "001.stage"
+            stage_file.write_text(text)
+            
+            # Run the function with a block size smaller than the number of rows
+            base_data, node_data = read_node_data_txt(stage_file, 2, phrase = "Time;", 
+                base_phrase = "Stage information", block_rows = 2)
+            no_base, _ = read_node_data_txt(stage_file, 2, phrase = "Time;")
+
+            # Assert a missing phrase
+            self.assertRaises(ValueError, read_node_data_txt, stage_file, 2, phrase = "Missing;")
+
+        # Assert base data and node by time data without the time column
+        np.testing.assert_array_equal(np.array([[1, 29.37, 56.44, 171.78], [2, 29.36, 56.44, 167.94]]), base_data)
+        np.testing.assert_array_equal(np.array([[0.5, 0.0, 1.25], [1.5, 2.5, 3.5]]), node_data)
+        self.assertIsNone(no_base)
+
+    @patch('app.attributes.Basin', autospec=True)
+    def test_create_mean_series(self, mock_basin):
+        # Create a basin array with a single reach
+        mock_basin.keys = ["1"]
+        mock_basin.offsets = np.array([0, 5])
+        data = np.reshape(np.arange(0, 50, dtype=float), (5, 10))
+        data_dict = create_mean_series(BasinArray(data, mock_basin))
+        
+        # Assert result
+        mean_series = pd.Series([20, 21, 22, 23, 24, 25, 26, 27, 28, 29], dtype=float)
+        self.assertTrue(data_dict["1"].equals(mean_series))
+
+    def test_reduce_reaches(self):
+        # Three reaches of 3, 1 and 4 nodes with NaN values
+        data = np.reshape(np.arange(0, 24, dtype=float) ** 1.5, (8, 3))
+        data[0, 0] = np.nan
+        data[3, :] = np.nan
+        data[4, 2] = np.nan
+        data[6, 2] = np.nan
+        offsets = np.array([0, 3, 4, 8])
+        stats = reduce_reaches(data, offsets, ("count", "sum", "mean", "var", "std", "median"))
+        
+        # Assert each statistic against the NaN-aware numpy reduction of each reach
+        np.testing.assert_array_equal([[2, 3, 3], [0, 0, 0], [4, 4, 2]], stats["count"])
+        for i in range(3):
+            reach = data[offsets[i]:offsets[i + 1]]
+            np.testing.assert_allclose(np.nansum(reach, axis = 0), stats["sum"][i])
+            if i == 1:
+                for name in ["mean", "var", "std", "median"]:
+                    self.assertTrue(np.isnan(stats[name][i]).all())
+                continue
+            np.testing.assert_allclose(np.nanmean(reach, axis = 0), stats["mean"][i])
+            np.testing.assert_allclose(np.nanvar(reach, axis = 0), stats["var"][i])
+            np.testing.assert_allclose(np.nanstd(reach, axis = 0), stats["std"][i])
+            np.testing.assert_allclose(np.nanmedian(reach, axis = 0), stats["median"][i])
+
+        # Assert one dimensional node data
+        stats = reduce_reaches(data[:, 1], offsets, ("mean", "median"))
+        np.testing.assert_allclose([np.mean(data[0:3, 1]), np.nan, np.nanmedian(data[4:8, 1])],
+            [stats["mean"][0], stats["median"][1], stats["median"][2]])
+        self.assertEqual((3,), stats["mean"].shape)
+
+if __name__ == '__main__':
+    unittest.main()
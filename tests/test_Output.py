@@ -0,0 +1,116 @@
+# Standard library imports
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+
+# Third party imports
+from netCDF4 import chartostring, Dataset
+import numpy as np
+import pandas as pd
+
+# Local imports
+from app.attributes.Basin import Basin, BasinArray
+from app.attributes.Topology import Topology
+from app.Output import Output, create_reach_id_var, get_encoding, stack_reach_series
+
+class TestOutput(unittest.TestCase):
+    """Tests the methods in the Output class."""
+
+    TOPOLOGY = [
+        "index,lon,lat,link,dslink",
+        "30369,29.37,56.446,2,3",
+        "30370,29.36,56.446,1,2",
+        "30371,29.35,56.446,2,3",
+        "30372,29.34,56.446,10,2"
+    ]
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        topology_file = self.root / "008_T.csv"
+        topology_file.write_text("\n".join(self.TOPOLOGY) + "\n")
+        self.basin = Basin(Topology(topology_file), "008")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_create_reach_id_var(self):
+        with Dataset(self.root / "test.nc", "w", format="NETCDF4") as dataset:
+            dataset.createDimension("nreach", 3)
+            dataset.createDimension("nchar", 6)
+            create_reach_id_var(dataset, ("nreach", "nchar"), self.basin.keys)
+
+            # Assert shorter keys are padded
+            np.testing.assert_array_equal(["008_1", "008_10", "008_2"], 
+                chartostring(dataset["reach_id"][:]))
+
+    @patch('app.Output.extract_config', { "output_encoding" : {
+        "width" : { "dtype" : "f4", "zlib" : True, "chunksizes" : { "nx" : 2, "nt" : 1000 } },
+        "node/width" : { "least_significant_digit" : 2 } } })
+    def test_get_encoding(self):
+        with Dataset(self.root / "test.nc", "w", format="NETCDF4") as dataset:
+            dataset.createDimension("nt", 10)
+            dataset.createDimension("nx", 4)
+            node = dataset.createGroup("node")
+
+            # Assert group settings are added and chunks are limited to dimension sizes
+            datatype, encoding = get_encoding(node, "width", ("nx", "nt"))
+            self.assertEqual("f4", datatype)
+            self.assertEqual({ "zlib" : True, "chunksizes" : [2, 10], 
+                "least_significant_digit" : 2 }, encoding)
+
+            # Assert defaults and scalar variables
+            self.assertEqual(("f8", {}), get_encoding(node, "wse", ("nx", "nt")))
+            self.assertEqual(("f4", {}), get_encoding(dataset.createGroup("reach"), "width", ()))
+
+    def test_stack_reach_series(self):
+        reach_dict = { "008_1" : pd.Series([1.0, np.nan]), "008_2" : pd.Series([3.0, 4.0]) }
+        stacked = stack_reach_series(reach_dict, ["008_2", "008_1"])
+        np.testing.assert_array_equal([[3.0, 4.0], [1.0, -9999]], stacked.filled(-9999))
+        np.testing.assert_array_equal([[False, False], [False, True]], stacked.mask)
+
+    @patch('app.Output.get_time_steps', return_value = range(2))
+    @patch('app.Output.extract_config', { "output_layout" : "parallel", "output_encoding" : {},
+        "products" : ["d_x_area", "slope2", "width", "wse", "Qhat", "Qsd"] })
+    def test_write_basin_output(self, mock_time_steps):
+
+        # Create data for a basin with three reaches of 1, 1 and 2 nodes
+        wse = np.array([[1.0, 2.0], [3.0, np.nan], [5.0, 6.0], [7.0, 8.0]])
+        reach_dict = { key : pd.Series([float(i), np.nan]) for i, key in enumerate(self.basin.keys) }
+        slope = Mock(slope_reach = reach_dict, wse_node = BasinArray(wse, self.basin))
+        slope.get_basin_matrix.return_value = np.where(np.isnan(wse), np.nan, 0.05)
+        data = {
+            "basin" : self.basin,
+            "discharge" : Mock(qhat_reach = dict(zip(self.basin.keys, [1.0, np.nan, 3.0])),
+                qsd_reach = dict(zip(self.basin.keys, [0.1, 0.2, 0.3]))),
+            "dxarea" : Mock(dxarea_reach = reach_dict, dxarea_node = BasinArray(wse - 1, self.basin)),
+            "slope" : slope,
+            "width" : Mock(width_reach = reach_dict, width_node = BasinArray(wse * 2, self.basin)),
+            "wse" : Mock(wse_reach = reach_dict, wse_node = BasinArray(wse, self.basin))
+        }
+
+        # Execute function with the basin layout used when parallel output is 
+        # not available; assert source data is not changed
+        Output(data, self.root, Mock(), "basin").write_output()
+        self.assertTrue(np.isnan(reach_dict["008_1"][1]))
+        self.assertTrue(np.isnan(wse[1, 1]))
+
+        # Assert SWOT reach and node data of the whole basin
+        with Dataset(self.root / "008_SWOT.nc") as dataset:
+            np.testing.assert_array_equal([1, 1, 2], dataset["reach"]["node_count"][:])
+            np.testing.assert_array_equal([0, 1, 2, 2], dataset["node"]["reach_index"][:])
+            np.testing.assert_array_equal([[0, -9999], [1, -9999], [2, -9999]],
+                dataset["reach"]["wse"][:].filled())
+            np.testing.assert_array_equal(np.where(np.isnan(wse), -9999, wse * 2),
+                dataset["node"]["width"][:].filled())
+            np.testing.assert_array_equal([0.05, -9999], dataset["node"]["slope2"][1].filled())
+            self.assertEqual("node width", dataset["node"]["width"].long_name)
+
+        # Assert SoS reach data of the whole basin
+        with Dataset(self.root / "008_SOS.nc") as dataset:
+            np.testing.assert_array_equal([1.0, -9999, 3.0], dataset["reach"]["Qhat"][:].filled())
+            np.testing.assert_array_almost_equal([0.1, 0.2, 0.3], dataset["reach"]["Qsd"][:])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+# Standard library imports
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import patch, Mock
+
+# Third party imports
+from netCDF4 import chartostring, Dataset
+import numpy as np
+import pandas as pd
+
+# Local imports
+from app.attributes.Basin import Basin, BasinArray
+from app.attributes.Topology import Topology
+from app.ParallelOutput import ParallelOutput, create_layout, is_parallel_available
+
+class TestParallelOutput(unittest.TestCase):
+    """Tests the methods in the ParallelOutput class."""
+
+    TOPOLOGY = {
+        "008" : ["30369,29.37,56.446,2,3", "30370,29.36,56.446,1,2", "30371,29.35,56.446,2,3"],
+        "009" : ["40369,29.37,56.446,5,0", "40370,29.36,56.446,5,0"]
+    }
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.input_dir = self.root / "input"
+        for basin_num, lines in self.TOPOLOGY.items():
+            (self.input_dir / basin_num).mkdir(parents = True)
+            topology_file = self.input_dir / basin_num / (basin_num + "_T.csv")
+            topology_file.write_text("\n".join(["index,lon,lat,link,dslink"] + lines) + "\n")
+
+        # Single rank communicator
+        self.comm = Mock()
+        self.comm.Get_rank.return_value = 0
+        self.comm.Get_size.return_value = 1
+        self.comm.bcast.side_effect = lambda data, root: data
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_create_layout(self):
+        layout = create_layout(self.input_dir)
+        self.assertEqual({ "008" : (0, 0), "009" : (2, 3) }, layout["offsets"])
+        self.assertEqual(3, layout["number_reaches"])
+        self.assertEqual(5, layout["number_nodes"])
+        self.assertEqual(5, layout["key_length"])
+
+    def test_is_parallel_available(self):
+        self.assertTrue(is_parallel_available(self.comm))
+
+    @patch('app.Output.get_time_steps', return_value = range(2))
+    @patch('app.Output.extract_config', { "output_encoding" : { "width" : { "zlib" : True } },
+        "products" : ["d_x_area", "slope2", "width", "wse", "Qhat", "Qsd"] })
+    def test_write_basin(self, mock_time_steps):
+
+        # Define shared files
+        parallel_output = ParallelOutput(self.comm, self.input_dir, self.root, Mock())
+
+        # Write second basin only
+        basin = Basin(Topology(self.input_dir / "009" / "009_T.csv"), "009")
+        wse = np.array([[1.0, np.nan], [3.0, 4.0]])
+        reach_dict = { "009_5" : pd.Series([2.0, np.nan]) }
+        slope = Mock(slope_reach = reach_dict)
+        slope.get_basin_matrix.return_value = np.full((2, 2), 0.01)
+        parallel_output.write_basin({
+            "basin" : basin,
+            "discharge" : Mock(qhat_reach = { "009_5" : 5.0 }, qsd_reach = { "009_5" : 0.5 }),
+            "dxarea" : Mock(dxarea_reach = reach_dict, dxarea_node = BasinArray(wse, basin)),
+            "slope" : slope,
+            "width" : Mock(width_reach = reach_dict, width_node = BasinArray(wse, basin)),
+            "wse" : Mock(wse_reach = reach_dict, wse_node = BasinArray(wse, basin))
+        })
+        parallel_output.close()
+
+        # Assert basin ranges of shared files
+        with Dataset(self.root / ParallelOutput.SWOT_FILE) as dataset:
+            self.assertEqual("009_5", chartostring(dataset["reach"]["reach_id"][2]))
+            np.testing.assert_array_equal([2, -9999], dataset["reach"]["wse"][2].filled())
+            np.testing.assert_array_equal([2, 2], dataset["node"]["reach_index"][3:])
+            np.testing.assert_array_equal([[1, -9999], [3, 4]], dataset["node"]["width"][3:].filled())
+            self.assertTrue(dataset["node"]["wse"][:3].mask.all())
+
+            # Assert compression is left out
+            self.assertFalse(dataset["reach"]["width"].filters()["zlib"])
+        with Dataset(self.root / ParallelOutput.SOS_FILE) as dataset:
+            np.testing.assert_array_equal([5.0], dataset["reach"]["Qhat"][2:])
+
+    @patch('app.Output.get_time_steps', return_value = range(2))
+    @patch('app.Output.extract_config', { "output_encoding" : {}, "products" : ["Qhat", "Qsd"] })
+    def test_write_basin_sos_only(self, mock_time_steps):
+
+        # Define shared files with SoS products only
+        parallel_output = ParallelOutput(self.comm, self.input_dir, self.root, Mock())
+        self.assertIsNone(parallel_output.swot_dataset)
+
+        # Write second basin; assert only the SoS file is written
+        basin = Basin(Topology(self.input_dir / "009" / "009_T.csv"), "009")
+        parallel_output.write_basin({ "basin" : basin,
+            "discharge" : Mock(qhat_reach = { "009_5" : 5.0 }, qsd_reach = { "009_5" : 0.5 }) })
+        parallel_output.close()
+        self.assertFalse((self.root / ParallelOutput.SWOT_FILE).exists())
+        with Dataset(self.root / ParallelOutput.SOS_FILE) as dataset:
+            np.testing.assert_array_equal([5.0], dataset["reach"]["Qhat"][2:])
+
+if __name__ == '__main__':
+    unittest.main()
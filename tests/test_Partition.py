@@ -0,0 +1,56 @@
+# Standard library imports
+from pathlib import Path
+import tempfile
+import unittest
+
+# Local imports
+from app.Partition import estimate_costs, get_basin_metric, partition_basins
+
+class TestPartition(unittest.TestCase):
+    """Tests the functions in the Partition file."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.dir_list = []
+        for basin_num, links, stage_bytes in [("001", [1, 1, 2], 300), ("002", [1], 100)]:
+            basin_dir = self.root / basin_num
+            basin_dir.mkdir()
+            with open(basin_dir / (basin_num + "_T.csv"), "w") as topology_file:
+                topology_file.write("index,lon,lat,link,dslink\n")
+                for i, link in enumerate(links):
+                    topology_file.write(f"{i},29.37,56.446,{link},0\n")
+            (basin_dir / (basin_num + ".stage")).write_bytes(b"0" * stage_bytes)
+            self.dir_list.append(basin_dir)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_get_basin_metric(self):
+        self.assertEqual(3, get_basin_metric(self.dir_list[0], "nodes"))
+        self.assertEqual(2, get_basin_metric(self.dir_list[0], "reaches"))
+        self.assertEqual(300, get_basin_metric(self.dir_list[0], "stage_bytes"))
+        self.assertEqual(0, get_basin_metric(self.dir_list[0], "discharge_bytes"))
+        self.assertRaises(ValueError, get_basin_metric, self.dir_list[0], "unknown")
+
+    def test_estimate_costs(self):
+        # Each metric is normalized by its mean
+        cost_dict = estimate_costs(self.dir_list, { "stage_bytes" : 1.0, "nodes" : 0.5 })
+        self.assertAlmostEqual(1.5 + 0.75, cost_dict[self.dir_list[0]])
+        self.assertAlmostEqual(0.5 + 0.25, cost_dict[self.dir_list[1]])
+
+    def test_partition_basins(self):
+        cost_dict = { "a" : 7.0, "b" : 5.0, "c" : 4.0, "d" : 3.0, "e" : 3.0, "f" : 2.0 }
+        dir_dict, load_dict = partition_basins(cost_dict, 3)
+
+        # Assert longest-processing-time-first assignment
+        self.assertEqual({ 0 : ["a", "f"], 1 : ["b", "e"], 2 : ["c", "d"] }, dir_dict)
+        self.assertEqual({ 0 : 9.0, 1 : 8.0, 2 : 7.0 }, load_dict)
+
+        # Assert ranks without basins
+        dir_dict, load_dict = partition_basins({ "a" : 1.0 }, 2)
+        self.assertEqual({ 0 : ["a"], 1 : [] }, dir_dict)
+        self.assertEqual({ 0 : 1.0, 1 : 0.0 }, load_dict)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,11 +7,11 @@ from unittest.mock import patch
 # Third party imports
 import numpy as np
 import pandas as pd
-from pandas._testing import assert_frame_equal
 
 # Local imports
-from app.attributes.Slope import Slope, _calculate_distance, \
-    _create_node_distance_list, _apply_linear_regression, _calculate_reach
+from app.attributes.Slope import Slope, _calculate_reach, \
+    _calculate_basin_distances, _calculate_slope_series, _create_basin_distance_dict, \
+    _calculate_slope_loop, _calculate_slope_numpy, _calculate_slope_serial_jit, calculate_slope
 from app.attributes.Topology import Topology
 
 class TestSlope(unittest.TestCase):
@@ -24,6 +24,7 @@ class TestSlope(unittest.TestCase):
     COORD_DATA = COORD_DATA.rename(columns = {"index" : "nodeid"})
     COORD_DATA = COORD_DATA.astype({ "nodeid" : str})
     COORD_DATA.set_index("nodeid", inplace=True)
+    TOPO_DATA = COORD_DATA.rename(columns = {"link" : "reachid"})
 
     WSE_DATA = [33.5, 30, 28.75, 25, 24.3, 23.8, 22, 20, 18.6, 17, 15.85, 13.12, 
         10, 8.6, 5.43, 4.40, 4.15, 3.33, 3.05, 2.75, 2.35, 1.95, 1.50, 1.25, 1.05]
@@ -35,44 +36,90 @@ class TestSlope(unittest.TestCase):
 
     COLUMNS = np.arange(0,5)
 
-    def test_calculate_distance(self):        
-        # Retrieve row and start node data
-        start_data = self.COORD_DATA.iloc[0]
-        row_data = self.COORD_DATA.iloc[1]
-
-        # Run function and assert result
-        distance = _calculate_distance(row_data, start_data)
-        self.assertAlmostEqual(616.7233638731635, distance)
-
-    def test_create_node_distance_list(self):
-        
-        distance_df = _create_node_distance_list(self.COORD_DATA)
-
-        # Assert distances
-        self.assertAlmostEqual(0.0, distance_df.iloc[0])
-        self.assertAlmostEqual(616.7233638731635, distance_df.iloc[1])
-        self.assertAlmostEqual(1233.4467244843192, distance_df.iloc[2])
-        self.assertAlmostEqual(1850.1700785721137, distance_df.iloc[3])
-        self.assertAlmostEqual(2466.8934228745406, distance_df.iloc[4])
-
-    def test_apply_linear_regression(self):
-
-        distance_list = pd.Series([0.0, 616.72336, 1233.44672, 1850.170079, 2466.893423], index=[1, 2, 3, 4, 5])
-        slope = _apply_linear_regression(self.WSE_DATA.iloc[:, 0], distance_list)
+    def test_calculate_basin_distances(self):
         
-        # Assert slope result
-        self.assertAlmostEqual(0.01325, slope, places=5)
+        distances = _calculate_basin_distances(self.TOPO_DATA)
+
+        # Assert distances from the start node of the reach
+        self.assertAlmostEqual(0.0, distances[0])
+        self.assertAlmostEqual(616.7233638731635, distances[1])
+        self.assertAlmostEqual(1233.4467244843192, distances[2])
+        self.assertAlmostEqual(1850.1700785721137, distances[3])
+        self.assertAlmostEqual(2466.8934228745406, distances[4])
+
+    def test_create_basin_distance_dict(self):
+
+        # Two reaches with interleaved nodes
+        topo_data = self.TOPO_DATA.copy()
+        topo_data["reachid"] = ["1", "2", "1", "2", "1"]
+        distance_dict = _create_basin_distance_dict(topo_data, "008")
+
+        # Assert distances are measured from the first node of each reach
+        self.assertEqual(["008_1", "008_2"], list(distance_dict.keys()))
+        self.assertEqual(["30369", "30371", "30373"], list(distance_dict["008_1"].index))
+        self.assertAlmostEqual(0.0, distance_dict["008_1"].iloc[0])
+        self.assertAlmostEqual(1233.4467244843192, distance_dict["008_1"].iloc[1])
+        self.assertAlmostEqual(2466.8934228745406, distance_dict["008_1"].iloc[2])
+        self.assertAlmostEqual(0.0, distance_dict["008_2"].iloc[0])
+        self.assertAlmostEqual(1233.4467244843192, distance_dict["008_2"].iloc[1])
+
+    def test_calculate_slope_series(self):
+
+        distance_list = pd.Series([0.0, 616.72336, 1233.44672, 1850.170079, 2466.893423])
+        wse = pd.concat([self.WSE_DATA, self.WSE_DATA.iloc[:, [0]]], axis = 1, ignore_index = True)
+        wse.iloc[1, 1] = np.nan    # 4 valid heights
+        wse.iloc[3, 5] = np.nan    # 4 valid heights
+        wse.iloc[:, 2] = np.nan    # no valid heights
+        slope_series = _calculate_slope_series(wse, distance_list)
+
+        # Assert slope matches a per time step fit and the min-5-valid rule
+        expected = -np.polyfit(distance_list, self.WSE_DATA.iloc[:, 3], 1)[0]
+        self.assertAlmostEqual(0.01325, slope_series.loc[0], places=5)
+        self.assertTrue(np.isnan(slope_series.loc[1]))
+        self.assertTrue(np.isnan(slope_series.loc[2]))
+        self.assertAlmostEqual(expected, slope_series.loc[3], places=10)
+        self.assertAlmostEqual(0.00985, slope_series.loc[4], places=5)
+        self.assertTrue(np.isnan(slope_series.loc[5]))
+
+    @unittest.skipIf(_calculate_slope_serial_jit is None, "numba is not installed")
+    def test_calculate_slope_jit(self):
+        # Reaches of 1 to 40 nodes with missing heights and time steps with fewer than 5
+        rng = np.random.default_rng(0)
+        for num_nodes in [1, 4, 5, 40]:
+            height = rng.uniform(0, 100, (num_nodes, 500))
+            height[rng.random(height.shape) < 0.3] = np.nan
+            distance = rng.uniform(0, 5000, num_nodes)
+            distance -= distance.mean()
+
+            # Assert compiled kernel and its loops (the parallel kernel) match NumPy exactly
+            expected = _calculate_slope_numpy(height, distance)
+            np.testing.assert_array_equal(expected, _calculate_slope_serial_jit(height, distance))
+            np.testing.assert_array_equal(expected, _calculate_slope_loop(height, distance))
+
+        # Assert a constant distance has zero slope
+        self.assertEqual(0.0, _calculate_slope_serial_jit(np.ones((5, 1)), np.zeros(5))[0])
+
+    def test_calculate_slope(self):
+        distance = _calculate_basin_distances(self.TOPO_DATA)
+        height = self.WSE_DATA.to_numpy()
+        with patch.dict("app.attributes.Slope.extract_config", { "use_numba" : False }):
+            expected = calculate_slope(height, distance)
+
+        # Assert NumPy fallback without numba and kernel give the same slope
+        with patch.dict("app.attributes.Slope.extract_config", { "use_numba" : True }):
+            np.testing.assert_array_equal(expected, calculate_slope(height, distance))
+            with patch("app.attributes.Slope._calculate_slope_serial_jit", None), \
+                patch("app.attributes.Slope._calculate_slope_jit", None):
+                np.testing.assert_array_equal(expected, calculate_slope(height, distance))
+        self.assertAlmostEqual(0.01325, expected[0], places = 5)
 
     def test_calculate_reach(self):
         
         # Data needed to create slope object
-        topo_data = self.COORD_DATA.rename(columns = {"link" : "reachid"})
-        topo_data = topo_data.astype({ "reachid" : str})
-        topo_dict = {}
-        topo_dict["008_1"] = topo_data
+        node_distances = _create_basin_distance_dict(self.TOPO_DATA, "008")["008_1"]
 
         # Create slope object and run method
-        slope_list = _calculate_reach(("008_1", self.WSE_DATA), topo_dict)
+        slope_list = _calculate_reach(("008_1", self.WSE_DATA), node_distances)
         
         # Assert values of returned slope list
         key = slope_list[0]
@@ -125,8 +172,7 @@ class TestSlope(unittest.TestCase):
         wse_node["008_1"] = pd.concat([self.WSE_DATA, pd_nan], axis = 1)
         wse_node["008_1"].columns = np.arange(500, 9862)
 
-        # Expected node dictionary
-        expected_dict = {}
+        # Expected node matrix
         expected_value = [
                         [0.01325, 0.01199, 0.01154, 0.01022, 0.00985],
                         [0.01325, 0.01199, 0.01154, 0.01022, 0.00985],
@@ -134,15 +180,16 @@ class TestSlope(unittest.TestCase):
                         [0.01325, 0.01199, 0.01154, 0.01022, 0.00985],
                         [0.01325, 0.01199, 0.01154, 0.01022, 0.00985],
                         ]
-        expected_dict["008_1"] = pd.DataFrame(expected_value)
-        expected_dict["008_1"] = pd.concat([expected_dict["008_1"], pd_nan], axis = 1)
-        expected_dict["008_1"].columns = np.arange(500, 9862)
-        expected_dict["008_1"].insert(0, "nodeid", self.COORD_DATA.index.to_numpy())
-        expected_dict["008_1"].set_index("nodeid", inplace = True)
+        expected = np.concatenate([expected_value, np_nan], axis = 1)
 
         # Create slope object; assert node values
         slope = Slope(mock_topo, wse_node, "008", self.INVALID_NODES)
-        assert_frame_equal(expected_dict["008_1"], slope.slope_node["008_1"], rtol=0.05)
+        np.testing.assert_allclose(expected, slope.get_node_matrix("008_1"), rtol=0.05)
+
+        # Assert node values are a read-only view of the reach values
+        self.assertEqual((5, 9362), slope.slope_node["008_1"].shape)
+        self.assertEqual(0, slope.slope_node["008_1"].strides[0])
+        self.assertFalse(slope.slope_node["008_1"].flags.writeable)
 
 if __name__ == '__main__':
     unittest.main()
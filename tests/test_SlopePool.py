@@ -0,0 +1,53 @@
+# Standard library imports
+import unittest
+from unittest.mock import patch
+
+# Third party imports
+import numpy as np
+
+# Local imports
+from app.attributes.Slope import calculate_reach_slopes
+from app.SlopePool import SlopePool, _split_reaches, get_pool_size
+
+class TestSlopePool(unittest.TestCase):
+    """Tests the methods in the SlopePool class."""
+
+    OFFSETS = np.array([0, 5, 6, 12, 20, 27])
+
+    def test_calculate(self):
+        # Basin of 5 reaches with a missing wse
+        rng = np.random.default_rng(0)
+        wse = rng.uniform(0, 10, (27, 4))
+        wse[7, 2] = np.nan
+        distances = rng.uniform(0, 1000, 27)
+
+        # Assert two basins calculated by the same workers match this process
+        pool = SlopePool(2)
+        try:
+            for basin_wse in [wse, wse[:, :3] * 2]:
+                expected = calculate_reach_slopes(basin_wse, distances, self.OFFSETS, range(5))
+                np.testing.assert_array_equal(expected,
+                    pool.calculate(basin_wse, distances, self.OFFSETS))
+        finally:
+            pool.close()
+        self.assertFalse(pool.directory.exists())
+
+    def test_split_reaches(self):
+        # Assert every reach is in one range of similar node counts
+        tasks = _split_reaches(self.OFFSETS, 3)
+        self.assertEqual([range(0, 3), range(3, 4), range(4, 5)], tasks)
+        self.assertEqual([range(0, 5)], _split_reaches(self.OFFSETS, 1))
+        self.assertEqual(list(range(5)), [i for task in _split_reaches(self.OFFSETS, 20) for i in task])
+
+    @patch('app.SlopePool.os.sched_getaffinity', return_value = set(range(16)))
+    def test_get_pool_size(self, mock_affinity):
+        # Assert cores are divided between ranks and limited by no_cores
+        with patch.dict('app.SlopePool.extract_config', { "no_cores" : 0 }):
+            self.assertEqual(4, get_pool_size(4))
+            self.assertEqual(1, get_pool_size(32))
+        with patch.dict('app.SlopePool.extract_config', { "no_cores" : 2 }):
+            self.assertEqual(2, get_pool_size(4))
+            self.assertEqual(1, get_pool_size(16))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,42 +5,47 @@ from unittest.mock import patch
 # Third party imports
 import numpy as np
 import pandas as pd
-from pandas._testing import assert_frame_equal
+from pandas._testing import assert_series_equal
 
 # Local imports
-from app.attributes.Width import _create_node_dict
+from app.attributes.Width import _create_node_array, _create_reach_dict
 
 class TestWidth(unittest.TestCase):
     """Tests the methods in the Width class."""
 
-    def test_create_node_dict(self):
-        
-        # Mock and create width data
-        width = [
-            [29.370833, 56.445833, 30.0, 30369],
-            [29.362500, 56.445833, 30.0, 30370],
-            [29.354167, 56.445833, 30.0, 30371],
-            [29.345833, 56.445833, 30.0, 30372],
-            [29.337500, 56.445833, 30.0, 30373]
-        ]
-        width_df = pd.DataFrame(width, columns=["x", "y", "width", "index"])
-        width_df.insert(0, "node", range(5))
-        width_df.set_index("node", inplace = True)
+    WIDTH = np.array([30.0, 30.0, 40.0, np.nan, 20.0])
+
+    @patch('app.attributes.Basin', autospec=True)
+    def test_create_node_array(self, mock_basin):
         
-        width_dict = {}
-        width_dict["008_1"] = width_df
+        # Mock basin with two reaches
+        mock_basin.keys = ["008_1", "008_2"]
+        mock_basin.slices = { "008_1" : slice(0, 3), "008_2" : slice(3, 5) }
 
         # Create expected data
-        node = pd.DataFrame(np.full((5, 9362), 30.0), dtype=float)
-        node.columns = np.arange(500, 9862)
-        node.insert(0, "node", range(5))
-        node.set_index("node", inplace = True)
-        expected_dict = {}
-        expected_dict["008_1"] = node
+        expected = np.full((3, 9362), 30.0)
+        expected[2, :] = 40.0
 
         # Execute function
-        node_dict = _create_node_dict(width_dict)
-        assert_frame_equal(expected_dict["008_1"], node_dict["008_1"])
+        node_array = _create_node_array(self.WIDTH, mock_basin)
+        np.testing.assert_array_equal(expected, node_array["008_1"])
+        self.assertEqual((2, 9362), node_array["008_2"].shape)
+
+        # Assert width is a read-only view of one value per node
+        self.assertEqual(0, node_array["008_1"].strides[1])
+        self.assertFalse(node_array["008_1"].flags.writeable)
+
+    @patch('app.attributes.Basin', autospec=True)
+    def test_create_reach_dict(self, mock_basin):
+
+        # Mock basin with two reaches; second reach has an invalid node
+        mock_basin.keys = ["008_1", "008_2"]
+        mock_basin.offsets = np.array([0, 3, 5])
+
+        # Execute function; assert mean width over valid nodes at each time step
+        reach_dict = _create_reach_dict(self.WIDTH, mock_basin)
+        assert_series_equal(pd.Series(np.full(9362, 100 / 3)), reach_dict["008_1"])
+        assert_series_equal(pd.Series(np.full(9362, 20.0)), reach_dict["008_2"])
 
 if __name__ == '__main__':
     unittest.main()